@@ -0,0 +1,11 @@
+# Lets the tests import treegen_core from the repository root
+import os
+
+import pytest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture(autouse=True)
+def repo_cwd(monkeypatch):
+    # Palettes are looked up relative to the working directory
+    monkeypatch.chdir(ROOT)
@@ -0,0 +1,26 @@
+"""Cancelling a generation from inside its batched loops."""
+import random
+
+import pytest
+
+import treegen_core as core
+
+@pytest.mark.parametrize("n", [0, 1, 2, core.SHUFFLE_BATCH + 3])
+def test_shuffle_list_draws_like_random_shuffle(n):
+    expected_rng, rng = random.Random(7), random.Random(7)
+    expected, got = list(range(n)), list(range(n))
+    expected_rng.shuffle(expected)
+    core.shuffle_list(got, rng)
+    assert got == expected
+    assert rng.getstate() == expected_rng.getstate()
+
+@pytest.mark.parametrize("generator", ["treegen", "pinegen"])
+def test_checkpoints_abort_a_build(generator):
+    def check():
+        raise core.GenerationCancelled()
+
+    build = core.OUTPUTS[generator][0]
+    _, defaults, palette_dir, palette = core.GENERATORS[generator]
+    with core.cancellable(check), pytest.raises(core.GenerationCancelled):
+        build(dict(defaults), f"{palette_dir}/{palette}")
+    core.checkpoint()
@@ -0,0 +1,50 @@
+"""Parameter and argument parsing shared by the CLI and the generation server."""
+import pytest
+
+import treegen_core as core
+
+@pytest.mark.parametrize("key, value, expected", [
+    ("seed", "5", 5),
+    ("seed", 5.0, 5),
+    ("size", 2, 2.0),
+    ("size", "0.5", 0.5),
+    ("world", "512x512x512", "512x512x512"),
+])
+def test_params_take_their_default_type(key, value, expected):
+    params = core.build_params("treegen", overrides=[(key, value)])
+    assert params[key] == expected and type(params[key]) is type(expected)
+
+def test_equal_params_share_a_cache_key(tmp_path):
+    cache = core.ResultCache(str(tmp_path))
+    keys = {cache.key("pinegen", core.build_params("pinegen", overrides=[("seed", seed)]), "pine/pine_default.png")
+            for seed in (5, "5", 5.0)}
+    assert len(keys) == 1
+
+@pytest.mark.parametrize("key, value", [
+    ("seed", "abc"), ("seed", 5.5), ("seed", True), ("size", "big"), ("size", "nan"), ("world", 3),
+])
+def test_bad_params_are_rejected(key, value):
+    with pytest.raises(ValueError, match=key):
+        core.build_params("treegen", overrides=[(key, value)])
+
+@pytest.mark.parametrize("command", ["batch", "explore", "bench"])
+def test_malformed_seeds_are_a_usage_error(command, capsys):
+    argv = [command] + (["treegen"] if command != "bench" else []) + ["--seeds", "1-x"]
+    with pytest.raises(SystemExit) as exit:
+        core.build_cli().parse_args(argv)
+    assert exit.value.code == 2
+    assert "--seeds" in capsys.readouterr().err
+
+def test_seeds_parse_to_a_list():
+    assert core.build_cli().parse_args(["explore", "treegen", "--seeds", "1,5,10-12"]).seeds == [1, 5, 10, 11, 12]
+
+@pytest.mark.parametrize("species, overrides, error", [
+    (["treegen"], [("leaves", "lots")], ValueError),
+    (["treegen", "pinegen"], [("sede", 3)], ValueError),
+    (["pinegen"], [("world", "huge")], ValueError),
+    (["treegen:nope.png"], [], OSError),
+])
+def test_bad_forest_input_fails_before_building(species, overrides, error, monkeypatch):
+    monkeypatch.setattr(core, "build_variant", None)  # never reached
+    with pytest.raises(error):
+        core.generate_forest(species, variants=1, overrides=overrides, workers=1)
@@ -0,0 +1,27 @@
+"""Palette index specs and sidecars."""
+import json
+import shutil
+
+import pytest
+
+import treegen_core as core
+
+@pytest.mark.parametrize("indices", [(9,), (9, 10, 11), (9, 10, 11, 25), (1, 3, 5), (255,)])
+def test_formatted_indices_parse_back(indices):
+    assert core.parse_palette_indices(core.format_palette_indices(indices)) == indices
+
+@pytest.mark.parametrize("spec", [12, "12", "[12]", [12]])
+def test_a_single_index_is_accepted(spec):
+    assert core.parse_palette_indices(spec) == (12,)
+
+@pytest.mark.parametrize("spec", [0, "256", "[]", "{}", None, 1.5])
+def test_bad_indices_are_rejected(spec):
+    with pytest.raises(ValueError):
+        core.parse_palette_indices(spec)
+
+def test_sidecar_may_name_a_single_index(tmp_path):
+    (tmp_path / "tree").mkdir()
+    shutil.copy("palettes/tree/tree_default.png", tmp_path / "tree" / "maple.png")
+    (tmp_path / "tree" / "maple.json").write_text(json.dumps({"leaves": 12, "trunk": "3"}))
+    palette = core.PaletteRegistry(str(tmp_path)).get("tree/maple.png")
+    assert (palette.leaves, palette.trunk, palette.source) == ((12,), (3,), "sidecar")
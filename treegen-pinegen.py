@@ -1,393 +1,226 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
-import numpy as np
-import math
-import struct
-import random
 import subprocess
 import platform
 import os
 import sys
-
-GRID = 256
-
-def clamp(v, mi, ma):
-    return max(mi, min(ma, v))
-
-def resource_path(filename):
-    """Get path to resource for PyInstaller --onefile"""
-    if hasattr(sys, '_MEIPASS'):
-        return os.path.join(sys._MEIPASS, filename)
-    return filename
-
-def load_palette_png(filename):
-    path = resource_path(filename)
-    image = Image.open(path).convert("RGBA")
-    pixels = list(image.getdata())
-    if len(pixels) != 256:
-        raise ValueError("Palette must be exactly 256 pixels wide")
-    return pixels
-
-# === TREEGEN palette index map ===
-TREE_PALETTE_MAP = {
-    "tree_default.png": {"leaves": [9, 17], "trunk": [57, 65]},
-    "tree_basic.png":   {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
-    "autumn.png":       {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
-    "birch.png":        {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
-    "blossom.png":      {"leaves": list(range(9, 25)), "trunk": list(range(57, 65))},
-    "dead.png":         {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
-    "oak1.png":         {"leaves": list(range(9, 17)), "trunk": list(range(65, 73))},
-    "oak2.png":         {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
-    "tree_sapling.png": {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))}
-}
-
-# === PINEGEN palette index map ===
-PINE_PALETTE_MAP = {
-    "pine_default.png": {"leaves": [9, 17], "trunk": [57, 65]},
-    "pine_basic.png":   {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
-    "redpine.png":      {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
-    "pine_sapling.png": {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
-    "scotspine.png":    {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))}
-}
-
-def generate_treegen_tree(params, palette_name):
-    random.seed(params['seed'])
-
-    palette_path = resource_path(os.path.join("palettes", palette_name))
-    palette = load_palette_png(palette_path)
-    palette_key = os.path.basename(palette_name)
-    palette_config = TREE_PALETTE_MAP.get(palette_key, TREE_PALETTE_MAP["tree_default.png"])
-    leaf_indices = palette_config["leaves"]
-    trunk_indices = palette_config["trunk"]
-
-    voxels = np.zeros((GRID, GRID, GRID), dtype=np.uint8)
-    gLeaves = []
-
-    size = 150 * params['size'] / params['iterations']
-    gTrunkSize = params['trunksize'] * params['size'] * 6
-    wide = min(params['wide'], 0.95)
-    gBranchLength0 = size * (1 - wide)
-    gBranchLength1 = size * wide
-
-    def normalize(x, y, z):
-        l = math.sqrt(x*x + y*y + z*z)
-        return (x/l, y/l, z/l) if l > 0 else (0, 0, 1)
-
-    trunk_voxels = []
-
-    def draw_line(x0, y0, z0, x1, y1, z1, r0, r1):
-        steps = int(math.dist([x0, y0, z0], [x1, y1, z1]) * 2)
-        for i in range(steps + 1):
-            t = i / steps
-            x = x0 + t * (x1 - x0)
-            y = y0 + t * (y1 - y0)
-            z = z0 + t * (z1 - z0)
-            r = r0 + t * (r1 - r0)
-            for dx in range(-math.ceil(r), math.ceil(r)+1):
-                for dy in range(-math.ceil(r), math.ceil(r)+1):
-                    for dz in range(-math.ceil(r), math.ceil(r)+1):
-                        if dx*dx + dy*dy + dz*dz <= r*r:
-                            vx = int(x+dx)
-                            vy = int(y+dy)
-                            vz = int(z+dz)
-                            if 0 <= vx < GRID and 0 <= vy < GRID and 0 <= vz < GRID:
-                                trunk_voxels.append((vx, vy, vz))
-
-    def get_branch_length(i):
-        t = math.sqrt((i - 1) / params['iterations'])
-        return gBranchLength0 + t * (gBranchLength1 - gBranchLength0)
-
-    def get_branch_size(i):
-        t = math.sqrt((i - 1) / params['iterations'])
-        return (1 - t) * gTrunkSize
-
-    def get_branch_angle(i):
-        t = math.sqrt((i - 1) / params['iterations'])
-        return 2.0 * params['spread'] * t
-
-    def get_branch_prob(i):
-        return math.sqrt((i - 1) / params['iterations'])
-
-    def branches(x, y, z, dx, dy, dz, i):
-        l = get_branch_length(i)
-        s0 = get_branch_size(i)
-        s1 = get_branch_size(i+1)
-        x1 = x + dx * l
-        y1 = y + dy * l
-        z1 = z + dz * l
-        draw_line(x, y, z, x1, y1, z1, s0, s1)
-
-        if i < params['iterations']:
-            b = 1
-            var = i * 0.2 * params['twisted']
-            if random.random() < get_branch_prob(i):
-                b = 2
-                var = get_branch_angle(i)
-            for _ in range(b):
-                dx2 = dx + random.uniform(-var, var)
-                dy2 = dy + random.uniform(-var, var)
-                dz2 = dz + random.uniform(-var, var)
-                dx2, dy2, dz2 = normalize(dx2, dy2, dz2)
-                branches(x1, y1, z1, dx2, dy2, dz2, i + 1)
-        else:
-            gLeaves.append((x1, y1, z1))
-            gLeaves.append(((x + x1)/2, (y + y1)/2, (z + z1)/2))
-
-    leaf_voxels = []
-
-    def add_leaves():
-        for pos in gLeaves:
-            x1, y1, z1 = map(int, pos)
-            for _ in range(int(5 * params['leaves'])):
-                x2, y2, z2 = x1, y1, z1
-                for _ in range(int(50 * params['leaves'])):
-                    leaf_voxels.append((x2, y2, z2))
-                    d = random.randint(1, 6)
-                    if d == 1: x2 -= 1
-                    elif d == 2: x2 += 1
-                    elif d in (3, 4):
-                        z2 += 1 if random.uniform(-1, 1) < params['gravity'] else -1
-                    elif d == 5: y2 -= 1
-                    else: y2 += 1
-
-        random.shuffle(leaf_voxels)
-        for i, (x, y, z) in enumerate(leaf_voxels):
-            idx = leaf_indices[i % len(leaf_indices)]
-            if 0 <= x < GRID and 0 <= y < GRID and 0 <= z < GRID:
-                if voxels[x, y, z] == 0:
-                    voxels[x, y, z] = idx
-
-    branches(GRID//2, GRID//2, 0, 0, 0, 1, 1)
-    add_leaves()
-
-    random.shuffle(trunk_voxels)
-    for i, (x, y, z) in enumerate(trunk_voxels):
-        idx = trunk_indices[i % len(trunk_indices)]
-        voxels[x, y, z] = idx
-
-    voxel_data = bytearray()
-    for x in range(GRID):
-        for y in range(GRID):
-            for z in range(GRID):
-                c = voxels[x, y, z]
-                if c > 0:
-                    voxel_data += struct.pack('<4B', x, y, z, c)
-
-    size_chunk = b'SIZE' + struct.pack('<ii', 12, 0)
-    size_chunk += struct.pack('<iii', GRID, GRID, GRID)
-
-    xyzi_payload = struct.pack('<i', len(voxel_data) // 4) + voxel_data
-    xyzi_chunk = b'XYZI' + struct.pack('<ii', len(xyzi_payload), 0) + xyzi_payload
-
-    rgba_payload = b''.join(struct.pack('<4B', *color) for color in palette)
-    rgba_chunk = b'RGBA' + struct.pack('<ii', len(rgba_payload), 0) + rgba_payload
-
-    main_content = size_chunk + xyzi_chunk + rgba_chunk
-    main_chunk = b'MAIN' + struct.pack('<ii', 0, len(main_content)) + main_content
-    vox_file = b'VOX ' + struct.pack('<i', 150) + main_chunk
-
-    counter_file = "treegen_counter.txt"
-    if os.path.exists(counter_file):
-        with open(counter_file, "r") as f:
-            try:
-                current = int(f.read().strip())
-            except ValueError:
-                current = 1
+import queue
+import threading
+import multiprocessing
+from treegen_core import (
+    WORLD_SIZES, MAX_HOLLOW, MESH_FORMATS, LOD_FACTORS, TREEGEN_DEFAULTS, PINEGEN_DEFAULTS, GenerationTrace,
+    GenerationWorker, ResultCache, PALETTES, STAGES, build_treegen_voxels, build_pinegen_voxels,
+    generate_treegen_tree, generate_pinegen_tree, render_projection, explore_seeds, parse_seeds, resource_path,
+    main as run_cli,
+)
+
+PREVIEW_SCALE = 2
+PREVIEW_SIZE = 256
+PREVIEW_DELAY_MS = 250
+EXPLORE_SEEDS = 50
+EXPLORE_COLUMNS = 5
+
+
+def open_file(filename):
+    if platform.system() == "Windows":
+        os.startfile(filename)
+    elif platform.system() == "Darwin":
+        subprocess.call(["open", filename])
     else:
-        current = 1
-
-    output_dir = os.path.join("output", "tree")
-    os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, f"treegen_output{current}.vox")
-
-    with open(filename, "wb") as f:
-        f.write(vox_file)
-
-    with open(counter_file, "w") as f:
-        f.write(str(current + 1))
-
-    return filename
-    
-def generate_pinegen_tree(params, palette_name):
-    random.seed(int(params["seed"]))
-
-    voxels = np.zeros((GRID, GRID, GRID), dtype=np.uint8)
-    trunk_vox, leaf_vox = [], []
-    gLeaves = []
-
-    # Load palette
-    palette_path = resource_path(os.path.join("palettes", palette_name))
-    palette = load_palette_png(palette_path)
-    palette_key = os.path.basename(palette_name)
-    palette_config = PINE_PALETTE_MAP.get(palette_key, PINE_PALETTE_MAP["pine_default.png"])
-    trunk_indices = palette_config["trunk"]
-    leaf_indices = palette_config["leaves"]
-
-    # Parameters
-    size = clamp(params["size"], 0.1, 3.0)
-    twisted = clamp(params["twisted"], 0, 3)
-    trunkheight = params["trunkheight"] * 10
-    density = clamp(params["branchdensity"], 0, 3) * 30
-    branchlength = clamp(params["branchlength"], 0, 3) * size * 20
-    branchdir = clamp(params["branchdir"], -5, 5)
-    leaves = clamp(params["leaves"], 0, 2)
-    trunk_width = size * params.get("trunksize", 2)
-    max_iter = math.floor(100 * size / 5)
-    fixed_size = 5
-    twisted = twisted / max_iter
-
-    def draw_line(x0, y0, z0, x1, y1, z1, r):
-        steps = int(math.dist([x0, y0, z0], [x1, y1, z1]) * 2)
-        for i in range(steps + 1):
-            t = i / steps
-            x = x0 + t * (x1 - x0)
-            y = y0 + t * (y1 - y0)
-            z = z0 + t * (z1 - z0)
-            for dx in range(-math.ceil(r), math.ceil(r)+1):
-                for dy in range(-math.ceil(r), math.ceil(r)+1):
-                    for dz in range(-math.ceil(r), math.ceil(r)+1):
-                        if dx*dx + dy*dy + dz*dz <= r*r:
-                            xi, yi, zi = int(x+dx), int(y+dy), int(z+dz)
-                            if 0 <= xi < GRID and 0 <= yi < GRID and 0 <= zi < GRID:
-                                trunk_vox.append((xi, yi, zi))
-
-    def normalize(x, y, z):
-        l = math.sqrt(x*x + y*y + z*z)
-        return (x/l, y/l, z/l) if l > 0 else (0, 1, 0)
-
-    def get_branch_size(i):
-        t = (i - 1) / max_iter
-        return (1 - t * t) * trunk_width
-
-    def branch(x, y, z, dx, dy, dz, l):
-        steps = math.ceil(l / 3)
-        l = l / steps
-        for _ in range(steps):
-            x1 = x + dx * l
-            y1 = y + dy * l
-            z1 = z + dz * l
-            dx += random.uniform(-1/steps, 1/steps)
-            dy += random.uniform(-1/steps, 1/steps) + 0.4 / steps
-            dz += random.uniform(-1/steps, 1/steps)
-            dx, dy, dz = normalize(dx, dy, dz)
-            draw_line(x, y, z, x1, y1, z1, 0)
-            gLeaves.append((x1, y1, z1))
-            x, y, z = x1, y1, z1
-
-    def generate_branches(x, y, z, dx, dy, dz, i):
-        l = fixed_size
-        s0 = get_branch_size(i)
-        x1 = x + dx * l
-        y1 = y + dy * l
-        z1 = z + dz * l
-        draw_line(x, y, z, x1, y1, z1, s0)
-
-        if y1 > trunkheight:
-            b = (1.0 - i / max_iter) * density + 1
-            for _ in range(int(b)):
-                a = random.uniform(0.0, math.tau)
-                idx = math.cos(a)
-                idy = random.uniform(0.5, 1.0) * branchdir
-                idz = math.sin(a)
-                idx, idy, idz = normalize(idx, idy, idz)
-                il = (1.0 - i / max_iter) * branchlength * random.uniform(0.5, 1.5)
-                t = random.uniform(0.0, 1.0)
-                x2 = x + (x1 - x) * t
-                y2 = y + (y1 - y) * t
-                z2 = z + (z1 - z) * t
-                branch(x2, y2, z2, idx, idy, idz, il + 3)
-
-        if i < max_iter:
-            var = i * 0.1 * twisted
-            dx2 = dx + random.uniform(-var, var)
-            dy2 = dy + random.uniform(-var, var)
-            dz2 = dz + random.uniform(-var, var)
-            dx2, dy2, dz2 = normalize(dx2, dy2, dz2)
-            generate_branches(x1, y1, z1, dx2, dy2, dz2, i + 1)
+        subprocess.call(["xdg-open", filename])
+
+def read_params(controls):
+    return {k: v.get() for k, v in controls.items() if k not in ("status", "open_after", "use_cache", "export_mesh",
+                                                              "export_lods")}
+
+def queue_generation(worker, controls, generate, palette_name, label):
+    """Snapshot the tab's controls and queue one generation on `worker`"""
+    params = read_params(controls)
+    open_after = controls["open_after"].get()
+    use_cache = controls["use_cache"].get()
+    meshes = MESH_FORMATS if controls["export_mesh"].get() else ()
+    lods = LOD_FACTORS if controls["export_lods"].get() else ()
+    label = f"{label} seed {params['seed']}"
+    trace = GenerationTrace()
+
+    def done(filename):
+        hollowed = trace.counters.get("hollowed_voxels", 0)
+        if hollowed:
+            share = 100 * hollowed / trace.counters["voxels"]
+            controls["status"].set(f"✅ Generated {filename}! (hollowed {hollowed} voxels, -{share:.0f}%)")
         else:
-            gLeaves.append((x1, y1, z1))
-            gLeaves.append(((x + x1)/2, (y + y1)/2, (z + z1)/2))
-
-    def generate_leaves():
-        radius = int(clamp(params.get("leaf_radius", 2), 1, 4))
-        vertical_stretch = clamp(params.get("leaf_stretch", 1.5), 0.1, 5.0)
-        direction_bias = clamp(params.get("leaf_bias", -0.3), -1.0, 1.0)
-        num_clusters = int(len(gLeaves) * clamp(leaves, 0.1, 2.0))
-        sphere_density = max(1, int(4 * leaves))
-        sources = random.sample(gLeaves, min(num_clusters, len(gLeaves)))
-
-        for x, y, z in sources:
-            cx, cy, cz = int(x), int(y), int(z)
-            for _ in range(sphere_density):
-                for dx in range(-radius, radius + 1):
-                    for dy in range(-radius, radius + 1):
-                        for dz in range(-radius, radius + 1):
-                            dist = (dx**2 + dz**2 + (dy * vertical_stretch)**2)
-                            if dist <= radius**2:
-                                if direction_bias < 0 and dy > 0:
-                                    continue
-                                if direction_bias > 0 and dy < 0:
-                                    continue
-                                if random.random() < 0.3:
-                                    continue
-                                lx, ly, lz = cx + dx, cy + dy, cz + dz
-                                if 0 <= lx < GRID and 0 <= ly < GRID and 0 <= lz < GRID:
-                                    if voxels[lx, ly, lz] == 0:
-                                        leaf_vox.append((lx, ly, lz))
-
-    generate_branches(GRID//2, 0, GRID//2, 0, 1, 0, 1)
-    generate_leaves()
-
-    random.shuffle(trunk_vox)
-    for i, (x, y, z) in enumerate(trunk_vox):
-        voxels[x, y, z] = trunk_indices[i % len(trunk_indices)]
-
-    random.shuffle(leaf_vox)
-    for i, (x, y, z) in enumerate(leaf_vox):
-        if 0 <= x < GRID and 0 <= y < GRID and 0 <= z < GRID:
-            if voxels[x, y, z] == 0:
-                voxels[x, y, z] = leaf_indices[i % len(leaf_indices)]
-
-    voxel_data = bytearray()
-    for x in range(GRID):
-        for y in range(GRID):
-            for z in range(GRID):
-                c = voxels[x, y, z]
-                if c > 0:
-                    voxel_data += struct.pack('<4B', x, z, y, c)
-
-    size_chunk = b'SIZE' + struct.pack('<ii', 12, 0)
-    size_chunk += struct.pack('<iii', GRID, GRID, GRID)
-    xyzi_payload = struct.pack('<i', len(voxel_data) // 4) + voxel_data
-    xyzi_chunk = b'XYZI' + struct.pack('<ii', len(xyzi_payload), 0) + xyzi_payload
-    rgba_payload = b''.join(struct.pack('<4B', *color) for color in palette)
-    rgba_chunk = b'RGBA' + struct.pack('<ii', len(rgba_payload), 0) + rgba_payload
-    main_content = size_chunk + xyzi_chunk + rgba_chunk
-    main_chunk = b'MAIN' + struct.pack('<ii', 0, len(main_content)) + main_content
-    vox_file = b'VOX ' + struct.pack('<i', 150) + main_chunk
-
-    counter_file = "pinegen_counter.txt"
-    count = 1
-    if os.path.exists(counter_file):
+            controls["status"].set(f"✅ Generated {filename}!")
+        if open_after:
+            open_file(filename)
+
+    def failed(e):
+        messagebox.showerror("Error", str(e))
+        controls["status"].set("⚠️ Generation failed")
+
+    def cancelled(_):
+        controls["status"].set(f"Cancelled {label}")
+
+    worker.submit(label, generate, params, palette_name, use_cache=use_cache, trace=trace,
+                  meshes=meshes, lods=lods, on_done=done, on_error=failed, on_cancel=cancelled)
+    controls["status"].set(f"⏳ Queued {label}")
+
+class LivePreview:
+    """Debounced low-resolution front view of a tab's current settings.
+
+    `read` returns (params, palette_name) and is called on the Tk thread; the
+    coarse build and projection run on a short-lived background thread.
+    """
+
+    def __init__(self, label, build, read, swap_yz=False):
+        self.label = label
+        self.build = build
+        self.read = read
+        self.swap_yz = swap_yz
+        self.after_id = None
+        self.busy = False
+        self.stale = False
+        self.results = queue.Queue()
+
+    def schedule(self, *_):
+        if self.after_id is not None:
+            self.label.after_cancel(self.after_id)
+        self.after_id = self.label.after(PREVIEW_DELAY_MS, self._start)
+
+    def _start(self):
+        self.after_id = None
+        if self.busy:
+            self.stale = True
+            return
+        self.busy = True
+        self.stale = False
+        threading.Thread(target=self._render, args=self.read(), daemon=True).start()
+        self.label.after(20, self._poll)
+
+    def _render(self, params, palette_name):
         try:
-            with open(counter_file, "r") as f:
-                count = int(f.read().strip()) + 1
-        except:
-            pass
-    with open(counter_file, "w") as f:
-        f.write(str(count))
-
-    output_dir = os.path.join("output", "pine")
-    os.makedirs(output_dir, exist_ok=True)
-    filename = os.path.join(output_dir, f"pinegen_output{count}.vox")
+            voxels, palette = self.build(params, palette_name, scale=PREVIEW_SCALE, stages=STAGES)
+            image = render_projection(voxels, palette, swap_yz=self.swap_yz)
+            fit = PREVIEW_SIZE / max(image.size)
+            self.results.put(image.resize((round(image.width * fit), round(image.height * fit)), Image.NEAREST))
+        except Exception as e:
+            self.results.put(e)
 
-    with open(filename, "wb") as f:
-        f.write(vox_file)
+    def _poll(self):
+        try:
+            result = self.results.get_nowait()
+        except queue.Empty:
+            self.label.after(20, self._poll)
+            return
+        self.busy = False
+        if isinstance(result, Image.Image):
+            photo = ImageTk.PhotoImage(result)
+            self.label.configure(image=photo)
+            self.label.image = photo
+        if self.stale:
+            self._start()
+
+class SeedExplorer:
+    """Contact sheet of a range of seeds for one tab's settings.
+
+    `read` returns (params, palette_name) and `pick(seed)` loads a seed back
+    into the tab; both are called on the Tk thread. Seeds render in spawned
+    worker processes, driven from a background thread.
+    """
+
+    def __init__(self, parent, generator, read, pick):
+        self.generator = generator
+        self.read = read
+        self.pick = pick
+        self.results = queue.Queue()
+        self.layout = None
+        params, _ = read()
+        self.window = tk.Toplevel(parent)
+        self.window.title(f"Explore {generator} seeds")
+        self.window.geometry("1020x760")
+
+        bar = ttk.Frame(self.window)
+        bar.pack(fill="x", padx=10, pady=5)
+        ttk.Label(bar, text="Seeds").pack(side="left", padx=(0, 5))
+        self.seeds = tk.StringVar(value=f"{params['seed']}-{params['seed'] + EXPLORE_SEEDS - 1}")
+        ttk.Entry(bar, textvariable=self.seeds, width=16).pack(side="left")
+        self.button = ttk.Button(bar, text="Render", command=self._start)
+        self.button.pack(side="left", padx=5)
+        self.status = tk.StringVar(value="Click a tile to load its seed")
+        ttk.Label(bar, textvariable=self.status).pack(side="left", padx=5)
+
+        self.canvas = tk.Canvas(self.window, background="white", highlightthickness=0)
+        scroll = ttk.Scrollbar(self.window, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scroll.set)
+        scroll.pack(side="right", fill="y")
+        self.canvas.pack(fill="both", expand=True)
+        self.canvas.bind("<Button-1>", self._click)
+        self._start()
+
+    def _start(self):
+        try:
+            seeds = parse_seeds(self.seeds.get())
+        except ValueError:
+            seeds = []
+        if not seeds:
+            self.status.set("⚠️ Enter seeds such as 1-50 or 1,5,10-20")
+            return
+        self.button.state(["disabled"])
+        self.status.set(f"⏳ Rendering {len(seeds)} seeds")
+        params, palette_name = self.read()
+        threading.Thread(target=self._render, args=(params, palette_name, seeds), daemon=True).start()
+        self.window.after(50, self._poll)
+
+    def _render(self, params, palette_name, seeds):
+        try:
+            sheet, cell, failures = explore_seeds(
+                self.generator, params, palette_name, seeds, columns=EXPLORE_COLUMNS,
+                progress=lambda done, total: self.results.put(("progress", done, total)),
+                mp_context=multiprocessing.get_context("spawn"))
+            self.results.put(("done", (sheet, cell, seeds), failures))
+        except Exception as e:
+            self.results.put(("error", e, None))
 
-    return filename
+    def _poll(self):
+        if not self.window.winfo_exists():
+            return
+        try:
+            while True:
+                kind, value, extra = self.results.get_nowait()
+                if kind == "progress":
+                    self.status.set(f"⏳ Rendered {value}/{extra} seeds")
+                    continue
+                self.button.state(["!disabled"])
+                if kind == "error":
+                    self.status.set(f"⚠️ {value}")
+                    return
+                sheet, cell, seeds = value
+                photo = ImageTk.PhotoImage(sheet)
+                self.canvas.delete("all")
+                self.canvas.create_image(0, 0, image=photo, anchor="nw")
+                self.canvas.image = photo
+                self.canvas.configure(scrollregion=(0, 0, sheet.width, sheet.height))
+                self.layout = (cell, seeds)
+                failed = f", {len(extra)} failed" if extra else ""
+                self.status.set(f"✅ {len(seeds)} seeds{failed}. Click a tile to load its seed")
+                return
+        except queue.Empty:
+            self.window.after(50, self._poll)
+
+    def _click(self, event):
+        if self.layout is None:
+            return
+        (width, height), seeds = self.layout
+        col = int(self.canvas.canvasx(event.x)) // width
+        index = int(self.canvas.canvasy(event.y)) // height * EXPLORE_COLUMNS + col
+        if col < EXPLORE_COLUMNS and index < len(seeds):
+            self.pick(seeds[index])
+            self.status.set(f"Loaded seed {seeds[index]}")
+
+def build_treegen_gui(tab, worker):
+    preview_label = ttk.Label(tab)
+    preview_label.pack(side="right", anchor="n", padx=(10, 0))
 
-def build_treegen_gui(tab):
     # === Branding Image
     try:
         img = Image.open(resource_path("treegen_brand.png"))
@@ -402,9 +235,8 @@ def build_treegen_gui(tab):
     ttk.Label(tab, text="Treegen v1.3 🌳 by NGNT", font=("Arial", 14, "bold")).pack()
 
     # === Palette dropdown
-    tree_palette_path = resource_path("palettes/tree")
-    palette_files = [f for f in os.listdir(tree_palette_path) if f.endswith(".png")]
-    palette_var = tk.StringVar(value=palette_files[0])
+    palette_files = PALETTES.names("tree")
+    palette_var = tk.StringVar(value="tree_default.png" if "tree_default.png" in palette_files else palette_files[0])
     palette_row = ttk.Frame(tab)
     palette_row.pack(fill="x", pady=4)
     ttk.Label(palette_row, text="Palette").pack(side="left", padx=(0, 5))
@@ -412,20 +244,42 @@ def build_treegen_gui(tab):
     palette_dropdown.pack(fill="x", expand=True)
 
     # === Sliders
+    d = TREEGEN_DEFAULTS
     controls = {
-        "size":        tk.DoubleVar(value=1.0),
-        "trunksize":   tk.DoubleVar(value=1.0),
-        "spread":      tk.DoubleVar(value=0.5),
-        "twisted":     tk.DoubleVar(value=0.5),
-        "leaves":      tk.DoubleVar(value=1.0),
-        "gravity":     tk.DoubleVar(value=0.0),
-        "iterations":  tk.IntVar(value=12),
-        "wide":        tk.DoubleVar(value=0.5),
-        "seed":        tk.IntVar(value=1),
+        "size":        tk.DoubleVar(value=d["size"]),
+        "trunksize":   tk.DoubleVar(value=d["trunksize"]),
+        "spread":      tk.DoubleVar(value=d["spread"]),
+        "twisted":     tk.DoubleVar(value=d["twisted"]),
+        "leaves":      tk.DoubleVar(value=d["leaves"]),
+        "gravity":     tk.DoubleVar(value=d["gravity"]),
+        "iterations":  tk.IntVar(value=d["iterations"]),
+        "wide":        tk.DoubleVar(value=d["wide"]),
+        "seed":        tk.IntVar(value=d["seed"]),
+        "world":       tk.StringVar(value=d["world"]),
+        "hollow":      tk.IntVar(value=d["hollow"]),
         "open_after":  tk.BooleanVar(value=True),
+        "use_cache":   tk.BooleanVar(value=True),
+        "export_mesh": tk.BooleanVar(value=False),
+        "export_lods": tk.BooleanVar(value=False),
         "status":      tk.StringVar(value="Ready")
     }
 
+    preview = LivePreview(preview_label, build_treegen_voxels,
+                          lambda: (read_params(controls), os.path.join("tree", palette_var.get())), swap_yz=False)
+    palette_dropdown.bind("<<ComboboxSelected>>", preview.schedule)
+
+    world_row = ttk.Frame(tab)
+    world_row.pack(fill="x", pady=4)
+    ttk.Label(world_row, text="World").pack(side="left", padx=(0, 5))
+    world_dropdown = ttk.Combobox(world_row, textvariable=controls["world"], values=WORLD_SIZES, state="readonly")
+    world_dropdown.pack(fill="x", expand=True)
+    world_dropdown.bind("<<ComboboxSelected>>", preview.schedule)
+
+    hollow_row = ttk.Frame(tab)
+    hollow_row.pack(fill="x", pady=4)
+    ttk.Label(hollow_row, text="Hollow shell (0 = solid)").pack(side="left", padx=(0, 5))
+    ttk.Spinbox(hollow_row, textvariable=controls["hollow"], from_=0, to=MAX_HOLLOW, width=5).pack(side="left")
+
     slider_defs = [
         ("Size", controls["size"], 0.1, 3.0),
         ("Trunk Size", controls["trunksize"], 0.1, 3.0),
@@ -459,16 +313,21 @@ def build_treegen_gui(tab):
         ttk.Label(row, text=label).pack(side="left", padx=(0, 5))
         val_label = ttk.Label(row, text=f"{var.get():.2f}" if isinstance(var.get(), float) else str(var.get()))
         val_label.pack(side="right")
+        # Keeps the readout current when the value is set from elsewhere, e.g. the seed explorer
+        var.trace_add("write", lambda *_, v=var, lbl=val_label: lbl.config(
+            text=f"{v.get():.2f}" if isinstance(v.get(), float) else str(v.get())))
 
         def make_callback(v=var, lbl=val_label):
             def update_val(_):
                 lbl.config(text=f"{v.get():.2f}" if isinstance(v.get(), float) else str(v.get()))
+                preview.schedule()
             return update_val
 
         def make_reset(v=var, l=label, lbl=val_label):
             def reset():
                 v.set(defaults[l])
                 lbl.config(text=f"{v.get():.2f}" if isinstance(v.get(), float) else str(v.get()))
+                preview.schedule()
             return reset
 
         ttk.Button(row, text="⭯", width=3, command=make_reset()).pack(side="right", padx=5)
@@ -479,29 +338,32 @@ def build_treegen_gui(tab):
         row.bind("<Leave>", lambda e: controls["status"].set("Ready"))
 
     ttk.Checkbutton(tab, text="Open file after generation", variable=controls["open_after"]).pack(pady=(5, 0))
+    ttk.Checkbutton(tab, text="Reuse cached results", variable=controls["use_cache"]).pack()
+    ttk.Checkbutton(tab, text="Also export OBJ + glTF mesh", variable=controls["export_mesh"]).pack()
+    ttk.Checkbutton(tab, text="Also export LODs (" + ", ".join(f"{f}x" for f in LOD_FACTORS) + ")",
+                    variable=controls["export_lods"]).pack()
 
     def generate():
-        try:
-            params = {k: v.get() for k, v in controls.items() if k not in ("status", "open_after")}
-            filename = generate_treegen_tree(params, os.path.join("tree", palette_var.get()))
-            controls["status"].set(f"✅ Generated {filename}!")
-            if controls["open_after"].get():
-                if platform.system() == "Windows":
-                    os.startfile(filename)
-                elif platform.system() == "Darwin":
-                    subprocess.call(["open", filename])
-                else:
-                    subprocess.call(["xdg-open", filename])
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            controls["status"].set("⚠️ Generation failed")
+        queue_generation(worker, controls, generate_treegen_tree, os.path.join("tree", palette_var.get()), "Tree")
+
+    def pick_seed(seed):
+        controls["seed"].set(seed)
+        preview.schedule()
+
+    def explore():
+        SeedExplorer(tab, "treegen", lambda: (read_params(controls), os.path.join("tree", palette_var.get())), pick_seed)
 
     ttk.Button(tab, text="🌳 Generate Tree", command=generate).pack(pady=10)
+    ttk.Button(tab, text="🔍 Explore Seeds", command=explore).pack()
     ttk.Label(tab, textvariable=controls["status"]).pack(pady=5)
+    preview.schedule()
 
     return controls
     
-def build_pinegen_gui(tab):
+def build_pinegen_gui(tab, worker):
+    preview_label = ttk.Label(tab)
+    preview_label.pack(side="right", anchor="n", padx=(10, 0))
+
     try:
         img = Image.open(resource_path("pinegen_brand.png"))
         img.thumbnail((650, 200))
@@ -514,32 +376,53 @@ def build_pinegen_gui(tab):
 
     ttk.Label(tab, text="Pinegen v1.3 🌲 by NGNT", font=("Arial", 14, "bold")).pack()
 
-    pine_palette_path = resource_path("palettes/pine")
-    palette_files = [f for f in os.listdir(pine_palette_path) if f.endswith(".png")]
-    palette_var = tk.StringVar(value=palette_files[0])
+    palette_files = PALETTES.names("pine")
+    palette_var = tk.StringVar(value="pine_default.png" if "pine_default.png" in palette_files else palette_files[0])
     palette_row = ttk.Frame(tab)
     palette_row.pack(fill="x", pady=4)
     ttk.Label(palette_row, text="Palette").pack(side="left", padx=(0, 5))
     palette_dropdown = ttk.Combobox(palette_row, textvariable=palette_var, values=palette_files, state="readonly")
     palette_dropdown.pack(fill="x", expand=True)
 
+    d = PINEGEN_DEFAULTS
     controls = {
-        "size":         tk.DoubleVar(value=1.0),
-        "twisted":      tk.DoubleVar(value=0.5),
-        "trunksize":    tk.DoubleVar(value=2.0),
-        "trunkheight":  tk.DoubleVar(value=1.0),
-        "branchdensity":tk.DoubleVar(value=1.0),
-        "branchlength": tk.DoubleVar(value=1.0),
-        "branchdir":    tk.DoubleVar(value=-0.5),
-        "leaves":       tk.DoubleVar(value=1.0),
-        "leaf_radius":  tk.DoubleVar(value=2.0),
-        "leaf_stretch": tk.DoubleVar(value=1.5),
-        "leaf_bias":    tk.DoubleVar(value=-0.3),
-        "seed":         tk.IntVar(value=1),
+        "size":         tk.DoubleVar(value=d["size"]),
+        "twisted":      tk.DoubleVar(value=d["twisted"]),
+        "trunksize":    tk.DoubleVar(value=d["trunksize"]),
+        "trunkheight":  tk.DoubleVar(value=d["trunkheight"]),
+        "branchdensity":tk.DoubleVar(value=d["branchdensity"]),
+        "branchlength": tk.DoubleVar(value=d["branchlength"]),
+        "branchdir":    tk.DoubleVar(value=d["branchdir"]),
+        "leaves":       tk.DoubleVar(value=d["leaves"]),
+        "leaf_radius":  tk.DoubleVar(value=d["leaf_radius"]),
+        "leaf_stretch": tk.DoubleVar(value=d["leaf_stretch"]),
+        "leaf_bias":    tk.DoubleVar(value=d["leaf_bias"]),
+        "seed":         tk.IntVar(value=d["seed"]),
+        "world":        tk.StringVar(value=d["world"]),
+        "hollow":       tk.IntVar(value=d["hollow"]),
         "open_after":   tk.BooleanVar(value=True),
+        "use_cache":    tk.BooleanVar(value=True),
+        "export_mesh":  tk.BooleanVar(value=False),
+        "export_lods":  tk.BooleanVar(value=False),
         "status":       tk.StringVar(value="Ready")
     }
 
+    preview = LivePreview(preview_label, build_pinegen_voxels,
+                          lambda: (read_params(controls), os.path.join("pine", palette_var.get())), swap_yz=True)
+    palette_dropdown.bind("<<ComboboxSelected>>", preview.schedule)
+
+    world_row = ttk.Frame(tab)
+    world_row.pack(fill="x", pady=4)
+    ttk.Label(world_row, text="World").pack(side="left", padx=(0, 5))
+    world_dropdown = ttk.Combobox(world_row, textvariable=controls["world"], values=WORLD_SIZES, state="readonly")
+    world_dropdown.pack(fill="x", expand=True)
+    world_dropdown.bind("<<ComboboxSelected>>", preview.schedule)
+
+    hollow_row = ttk.Frame(tab)
+    hollow_row.pack(fill="x", pady=4)
+    ttk.Label(hollow_row, text="Hollow shell (0 = solid)").pack(side="left", padx=(0, 5))
+    ttk.Spinbox(hollow_row, textvariable=controls["hollow"], from_=0, to=MAX_HOLLOW, width=5).pack(side="left")
+
     slider_defs = [
         ("Size", controls["size"], 0.1, 3.0),
         ("Twist", controls["twisted"], 0.0, 3.0),
@@ -579,16 +462,21 @@ def build_pinegen_gui(tab):
         ttk.Label(row, text=label).pack(side="left", padx=(0, 5))
         val_label = ttk.Label(row, text=f"{var.get():.2f}" if isinstance(var.get(), float) else str(var.get()))
         val_label.pack(side="right")
+        # Keeps the readout current when the value is set from elsewhere, e.g. the seed explorer
+        var.trace_add("write", lambda *_, v=var, lbl=val_label: lbl.config(
+            text=f"{v.get():.2f}" if isinstance(v.get(), float) else str(v.get())))
 
         def make_callback(v=var, lbl=val_label):
             def update_val(_):
                 lbl.config(text=f"{v.get():.2f}" if isinstance(v.get(), float) else str(v.get()))
+                preview.schedule()
             return update_val
 
         def make_reset(v=var, l=label, lbl=val_label):
             def reset():
                 v.set(defaults[l])
                 lbl.config(text=f"{v.get():.2f}" if isinstance(v.get(), float) else str(v.get()))
+                preview.schedule()
             return reset
 
         ttk.Button(row, text="⭯", width=3, command=make_reset()).pack(side="right", padx=5)
@@ -599,25 +487,25 @@ def build_pinegen_gui(tab):
         row.bind("<Leave>", lambda e: controls["status"].set("Ready"))
 
     ttk.Checkbutton(tab, text="Open file after generation", variable=controls["open_after"]).pack(pady=(5, 0))
+    ttk.Checkbutton(tab, text="Reuse cached results", variable=controls["use_cache"]).pack()
+    ttk.Checkbutton(tab, text="Also export OBJ + glTF mesh", variable=controls["export_mesh"]).pack()
+    ttk.Checkbutton(tab, text="Also export LODs (" + ", ".join(f"{f}x" for f in LOD_FACTORS) + ")",
+                    variable=controls["export_lods"]).pack()
 
     def generate():
-        try:
-            params = {k: v.get() for k, v in controls.items() if k not in ("status", "open_after")}
-            filename = generate_pinegen_tree(params, os.path.join("pine", palette_var.get()))
-            controls["status"].set(f"✅ Generated {filename}!")
-            if controls["open_after"].get():
-                if platform.system() == "Windows":
-                    os.startfile(filename)
-                elif platform.system() == "Darwin":
-                    subprocess.call(["open", filename])
-                else:
-                    subprocess.call(["xdg-open", filename])
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-            controls["status"].set("⚠️ Generation failed")
+        queue_generation(worker, controls, generate_pinegen_tree, os.path.join("pine", palette_var.get()), "Pine")
+
+    def pick_seed(seed):
+        controls["seed"].set(seed)
+        preview.schedule()
+
+    def explore():
+        SeedExplorer(tab, "pinegen", lambda: (read_params(controls), os.path.join("pine", palette_var.get())), pick_seed)
 
     ttk.Button(tab, text="🌲 Generate Pine Tree", command=generate).pack(pady=10)
+    ttk.Button(tab, text="🔍 Explore Seeds", command=explore).pack()
     ttk.Label(tab, textvariable=controls["status"]).pack(pady=5)
+    preview.schedule()
 
     return controls
 
@@ -626,7 +514,19 @@ def build_pinegen_gui(tab):
 def run_gui():
     root = tk.Tk()
     root.title("Voxel Tree Generator Studio")
-    root.geometry("750x850")
+    root.geometry("1050x850")
+
+    # Outputs are copied out of the cache: they may be edited in MagicaVoxel
+    worker = GenerationWorker(cache=ResultCache(link=False), stages=STAGES)
+    job_bar = ttk.Frame(root)
+    job_bar.pack(side="bottom", fill="x", padx=10, pady=(0, 10))
+    job_progress = tk.DoubleVar(value=0.0)
+    job_status = tk.StringVar(value="Idle")
+    ttk.Button(job_bar, text="Cancel", command=worker.cancel).pack(side="right")
+    ttk.Label(job_bar, textvariable=job_status, width=36).pack(side="right", padx=5)
+    ttk.Progressbar(job_bar, variable=job_progress, maximum=1.0).pack(side="left", fill="x", expand=True)
+    last_run = tk.StringVar(value="")
+    ttk.Label(root, textvariable=last_run).pack(side="bottom", anchor="w", padx=10)
 
     notebook = ttk.Notebook(root)
     notebook.pack(fill="both", expand=True, padx=10, pady=10)
@@ -637,11 +537,41 @@ def run_gui():
     notebook.add(tree_tab, text="Treegen 🌳")
     notebook.add(pine_tab, text="Pinegen 🌲")
 
-    build_treegen_gui(tree_tab)
-    build_pinegen_gui(pine_tab)
-
+    build_treegen_gui(tree_tab, worker)
+    build_pinegen_gui(pine_tab, worker)
+
+    def poll_worker():
+        for kind, job, value in worker.drain():
+            if kind == "progress":
+                job_progress.set(value)
+                waiting = worker.pending - 1
+                job_status.set(job["label"] + (f" (+{waiting} queued)" if waiting > 0 else ""))
+            elif kind == "done":
+                if job["trace"] is not None:
+                    last_run.set(f"Last run, {job['label']}: {job['trace'].summary()}")
+                if job["on_done"]:
+                    job["on_done"](value)
+            elif kind == "error" and job["on_error"]:
+                job["on_error"](value)
+            elif kind == "cancelled" and job["on_cancel"]:
+                job["on_cancel"](value)
+        if worker.pending == 0:
+            job_progress.set(0.0)
+            job_status.set("Idle")
+        root.after(50, poll_worker)
+
+    poll_worker()
     root.mainloop()
 
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        run_gui()
+        return 0
+    return run_cli(argv)
+
 
 if __name__ == "__main__":
-    run_gui()
\ No newline at end of file
+    # Frozen builds re-run this entry point in every spawned worker
+    multiprocessing.freeze_support()
+    sys.exit(main())
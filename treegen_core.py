@@ -0,0 +1,3031 @@
+"""Generation core of treegen-pinegen: palettes, both generators, .vox and mesh
+export, caches, forests and the headless CLI. Importable without Tk; the GUI
+in treegen-pinegen.py is a thin layer on top.
+"""
+import numpy as np
+import math
+import struct
+import random
+import os
+import sys
+import functools
+import json
+import io
+import hashlib
+import shutil
+import signal
+import time
+import queue
+import threading
+import collections
+import contextlib
+try:
+    import fcntl
+except ImportError:  # Windows: manifest appends rely on O_APPEND alone
+    fcntl = None
+# PIL, argparse, cProfile/pstats, concurrent.futures and platform are imported
+# where they are used, so a headless generation starts without them.
+
+GRID = 256
+WORLD_SIZES = ("256x256x256", "512x512x512", "512x512x768", "768x768x1024")
+MAX_WORLD = 2048
+MAX_HOLLOW = 16
+LOD_FACTORS = (2, 4, 8)
+LOD_THRESHOLD = 0.0  # fraction of a coarse cell's children that must be occupied
+STAMP_BATCH = 1 << 22
+LEAF_WALK_BATCH = 1 << 22
+SHUFFLE_BATCH = 1 << 18
+LEAF_DROPOUT = 0.3
+RNG_MODES = ("legacy", "numpy")
+COLOR_MODES = ("auto", "exact", "unique")
+GENERATION_STAGES = ("skeleton", "leaves", "colorize", "export")
+GENERATOR_VERSION = "1.3.1"  # bump whenever the same params would produce a different .vox
+CACHE_DIR = os.path.join("output", "cache")
+CACHE_MAX_BYTES = 1 << 30
+STAGE_CACHE_BYTES = 512 << 20
+
+def clamp(v, mi, ma):
+    return max(mi, min(ma, v))
+
+def resource_path(filename):
+    """Get path to resource for PyInstaller --onefile"""
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, filename)
+    return filename
+
+# === Sphere stamping ===
+@functools.lru_cache(maxsize=None)
+def sphere_kernel(radius):
+    """Integer offsets with dx*dx + dy*dy + dz*dz <= radius**2, in dx/dy/dz loop order"""
+    span = np.arange(-radius, radius + 1)
+    dx, dy, dz = np.meshgrid(span, span, span, indexing="ij")
+    d2 = dx*dx + dy*dy + dz*dz
+    keep = d2 <= radius * radius
+    offsets = np.stack([dx[keep], dy[keep], dz[keep]], axis=1)
+    d2 = d2[keep]
+    offsets.setflags(write=False)
+    d2.setflags(write=False)
+    return offsets, d2
+
+def stamp_samples(centers, r, radius, shape):
+    """Linear indices of spheres of radius r[i] around centers[i], none wider than `radius`.
+
+    Output runs sample by sample, offsets in dx/dy/dz loop order, duplicates kept.
+    """
+    offsets, d2 = sphere_kernel(radius)
+    r2 = r * r
+    dims = np.asarray(shape)
+    rows = max(1, STAMP_BATCH // len(d2))
+    out = [np.empty(0, dtype=np.int64)]
+    for start in range(0, len(r2), rows):
+        checkpoint()
+        sample, k = np.nonzero(d2[None, :] <= r2[start:start + rows, None])
+        v = np.trunc(centers[start + sample] + offsets[k]).astype(np.int64)
+        v = v[((v >= 0) & (v < dims)).all(axis=1)]
+        out.append((v[:, 0] * shape[1] + v[:, 1]) * shape[2] + v[:, 2])
+    return np.concatenate(out)
+
+def rasterize_segments(segments, shape=(GRID, GRID, GRID), trace=None):
+    """Linear indices swept by every row of a segment table, in table order.
+
+    Each segment is sampled int(length * 2) + 1 times with its radius going
+    linearly from r0 to r1. Samples, offsets and duplicates come out in the same
+    order as the old per-segment draw_line loops, so shuffling the result
+    reproduces legacy colors. Consecutive segments that need the same kernel
+    are stamped as one batch.
+    """
+    if len(segments) == 0:
+        return np.empty(0, dtype=np.int64)
+    start, end = segments["start"], segments["end"]
+    steps = np.array([int(math.dist(a, b) * 2) for a, b in zip(start.tolist(), end.tolist())],
+                     dtype=np.int64)
+    counts = steps + 1
+    first = np.cumsum(counts) - counts
+    seg = np.repeat(np.arange(len(segments)), counts)
+    t = (np.arange(len(seg)) - first[seg]) / np.maximum(steps, 1)[seg]
+    centers = start[seg] + t[:, None] * (end - start)[seg]
+    r = segments["r0"][seg] + t * (segments["r1"] - segments["r0"])[seg]
+    if trace is not None:
+        trace.count("sphere_samples", len(seg))
+
+    radius = np.maximum(np.ceil(np.maximum.reduceat(r, first)), 0).astype(np.int64)
+    bounds = np.concatenate([[0], np.flatnonzero(np.diff(radius)) + 1, [len(segments)]])
+    out = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        lo, hi = first[a], first[b - 1] + counts[b - 1]
+        out.append(stamp_samples(centers[lo:hi], r[lo:hi], int(radius[a]), shape))
+    return np.concatenate(out)
+
+def linear_indices(xyz, shape):
+    """Linear x-major indices of integer (n, 3) coordinates, -1 where out of bounds"""
+    xyz = np.asarray(xyz, dtype=np.int64).reshape(-1, 3)
+    inside = ((xyz >= 0) & (xyz < np.asarray(shape))).all(axis=1)
+    lin = (xyz[:, 0] * shape[1] + xyz[:, 1]) * shape[2] + xyz[:, 2]
+    return np.where(inside, lin, -1)
+
+def make_rng(params, seed):
+    """Random source for the params' RNG mode: a seeded random.Random for the
+    legacy stream, or a NumPy generator for the batched "numpy" engines"""
+    mode = params.get("rng", "legacy")
+    if mode not in RNG_MODES:
+        raise ValueError(f"Unknown RNG mode {mode!r}, expected one of {', '.join(RNG_MODES)}")
+    return np.random.default_rng(int(seed)) if mode == "numpy" else random.Random(seed)
+
+def world_shape(params):
+    """Export-space (x, y, z) size of the voxel world, z up, from params["world"]"""
+    spec = params.get("world", WORLD_SIZES[0])
+    try:
+        dims = tuple(int(n) for n in str(spec).lower().split("x"))
+    except ValueError:
+        dims = ()
+    if len(dims) != 3 or not all(1 <= n <= MAX_WORLD for n in dims):
+        raise ValueError(f"World size must be XxYxZ with each side 1-{MAX_WORLD}, got {spec!r}")
+    return dims
+
+def is_batched(rng):
+    return isinstance(rng, np.random.Generator)
+
+def rng_state(rng):
+    return rng.bit_generator.state if is_batched(rng) else rng.getstate()
+
+def restore_rng(params, state):
+    """A fresh random source for the params' RNG mode resumed at `state`"""
+    rng = make_rng(params, 0)
+    if is_batched(rng):
+        rng.bit_generator.state = state
+    else:
+        rng.setstate(state)
+    return rng
+
+def downsample_indices(indices, shape, scale):
+    """Unique linear indices of the cells `scale` times coarser per axis that hold `indices`"""
+    xyz = np.stack(np.unravel_index(indices, shape), axis=1) // scale
+    return np.unique(linear_indices(xyz, [n // scale for n in shape]))
+
+def shuffle_indices(indices, rng):
+    """`indices` in the order `rng` shuffles them, -1 entries included"""
+    if is_batched(rng):
+        order = rng.permutation(len(indices))
+    else:
+        order = list(range(len(indices)))
+        shuffle_list(order, rng)
+        order = np.asarray(order, dtype=np.int64)
+    return indices[order]
+
+def shuffle_list(x, rng):
+    """rng.shuffle(x) for a random.Random, drawing the same values, with a
+    checkpoint every SHUFFLE_BATCH swaps"""
+    randbelow = rng._randbelow
+    for stop in range(len(x) - 1, 0, -SHUFFLE_BATCH):
+        checkpoint()
+        for i in range(stop, max(stop - SHUFFLE_BATCH, 0), -1):
+            j = randbelow(i + 1)
+            x[i], x[j] = x[j], x[i]
+
+def unique_colors(params):
+    """Whether to color distinct voxels ("unique") rather than every stamped
+    sample like the legacy code ("exact"); "auto" is exact for the legacy stream"""
+    mode = params.get("colorize", "auto")
+    if mode not in COLOR_MODES:
+        raise ValueError(f"Unknown colorize mode {mode!r}, expected one of {', '.join(COLOR_MODES)}")
+    return mode == "unique" or (mode == "auto" and params.get("rng", "legacy") != "legacy")
+
+def unique_indices(indices):
+    """Sorted distinct non-negative entries of `indices`.
+
+    A plain sort and a neighbour compare: memory follows the number of
+    samples rather than the world volume, and it is much faster than np.unique.
+    """
+    cells = np.sort(indices[indices >= 0])
+    return cells[np.r_[True, cells[1:] != cells[:-1]]]
+
+def color_order(indices, rng, unique):
+    """`indices` in the order colors are dealt to them.
+
+    Exact mode shuffles every stamped sample, duplicates and all, which
+    reproduces legacy colors. Unique mode applies one permutation to the
+    distinct voxels instead; every voxel still gets a uniformly random palette
+    entry, but a legacy `rng` only spends one draw seeding the permutation.
+    """
+    if not unique:
+        return shuffle_indices(indices, rng)
+    cells = unique_indices(indices)
+    permute = rng if is_batched(rng) else np.random.default_rng(rng.getrandbits(64))
+    return cells[permute.permutation(len(cells))]
+
+def paint_cycled(voxels, indices, colors, overwrite=True):
+    """Paint `indices` in order, cycling through `colors`.
+
+    With `overwrite` later entries win, otherwise only empty voxels are filled,
+    first entry first, exactly like assigning one voxel at a time. Indices of -1
+    take their turn in the color cycle but are not painted.
+    """
+    checkpoint()
+    values = np.asarray(colors, dtype=np.uint8)[np.arange(len(indices)) % len(colors)]
+    keep = indices >= 0
+    if overwrite:
+        voxels.overwrite(indices[keep], values[keep])
+    else:
+        voxels.fill(indices[keep], values[keep])
+
+# === Batched leaf walks ===
+def random_walks(anchors, walks, steps, gravity, rng):
+    """Cells visited by `walks` random walks of `steps` cells from every anchor.
+
+    Each step moves one cell along x, y or z with equal odds; z steps go up
+    with probability (gravity + 1) / 2. Returns (n, 3) integer coordinates
+    ordered by anchor, walk and step, starting each walk at its anchor.
+    """
+    anchors = np.trunc(np.asarray(anchors, dtype=np.float64)).astype(np.int64).reshape(-1, 3)
+    if walks <= 0 or steps <= 0 or len(anchors) == 0:
+        return np.empty((0, 3), dtype=np.int64)
+    up = clamp((gravity + 1) / 2, 0.0, 1.0)
+    rows = max(1, LEAF_WALK_BATCH // (walks * steps))
+    out = []
+    for start in range(0, len(anchors), rows):
+        checkpoint()
+        n = len(anchors[start:start + rows]) * walks
+        d = rng.integers(0, 6, size=(n, steps - 1), dtype=np.int8)
+        z_up = rng.random((n, steps - 1)) < up
+        delta = np.zeros((n, steps, 3), dtype=np.int16)
+        delta[:, 1:, 0] = (d == 1).astype(np.int16) - (d == 0)
+        delta[:, 1:, 1] = (d == 5).astype(np.int16) - (d == 4)
+        delta[:, 1:, 2] = np.where((d == 2) | (d == 3), np.where(z_up, 1, -1), 0)
+        np.cumsum(delta, axis=1, out=delta)
+        origin = np.repeat(anchors[start:start + rows], walks, axis=0)
+        out.append((origin[:, None, :] + delta).reshape(-1, 3))
+    return np.concatenate(out)
+
+# === Leaf clusters ===
+def random_floats(rng, n):
+    """The next `n` values of rng.random() for a random.Random, drawn in one call"""
+    words = np.frombuffer(rng.getrandbits(64 * n).to_bytes(8 * n, "little"), dtype="<u4")
+    words = words.astype(np.float64)
+    return ((words[0::2] // 32) * 67108864.0 + words[1::2] // 64) * (1.0 / 9007199254740992.0)
+
+@functools.lru_cache(maxsize=None)
+def cluster_kernel(radius, stretch, bias):
+    """Offsets of a pinegen leaf cluster: a vertically stretched ellipsoid, cut to
+    the lower half for negative bias and the upper half for positive bias"""
+    span = np.arange(-radius, radius + 1)
+    dx, dy, dz = np.meshgrid(span, span, span, indexing="ij")
+    keep = dx**2 + dz**2 + (dy * stretch)**2 <= radius**2
+    if bias < 0:
+        keep &= dy <= 0
+    elif bias > 0:
+        keep &= dy >= 0
+    offsets = np.stack([dx[keep], dy[keep], dz[keep]], axis=1)
+    offsets.setflags(write=False)
+    return offsets
+
+def stamp_clusters(centers, offsets, repeats, shape, rng):
+    """Linear indices of leaf clusters stamped `repeats` times at every center.
+
+    Every cell of every repeat is dropped with probability LEAF_DROPOUT. With a
+    random.Random the drops are drawn in the legacy loop order and the result
+    keeps its duplicates in that order; with a NumPy `rng` the repeats collapse
+    into one Bernoulli draw per cell and the result is unique.
+    """
+    centers = np.trunc(np.asarray(centers, dtype=np.float64)).astype(np.int64).reshape(-1, 3)
+    keep_p = 1 - LEAF_DROPOUT ** repeats
+    rows = max(1, STAMP_BATCH // (repeats * len(offsets)))
+    out = [np.empty(0, dtype=np.int64)]
+    for start in range(0, len(centers), rows):
+        checkpoint()
+        chunk = centers[start:start + rows]
+        if not is_batched(rng):
+            kept = random_floats(rng, len(chunk) * repeats * len(offsets)) >= LEAF_DROPOUT
+            source, _, cell = np.nonzero(kept.reshape(len(chunk), repeats, len(offsets)))
+        else:
+            source, cell = np.nonzero(rng.random((len(chunk), len(offsets))) < keep_p)
+        lin = linear_indices(chunk[source] + offsets[cell], shape)
+        out.append(lin[lin >= 0])
+    out = np.concatenate(out)
+    return np.unique(out) if is_batched(rng) else out
+
+def pinegen_leaves(params, anchors, shape, rng, trace=None):
+    """Linear indices of pinegen leaf clusters stamped at a random sample of `anchors`"""
+    leaves = clamp(params["leaves"], 0, 2)
+    radius = int(clamp(params.get("leaf_radius", 2), 1, 4))
+    vertical_stretch = clamp(params.get("leaf_stretch", 1.5), 0.1, 5.0)
+    direction_bias = clamp(params.get("leaf_bias", -0.3), -1.0, 1.0)
+    num_clusters = int(len(anchors) * clamp(leaves, 0.1, 2.0))
+    sphere_density = max(1, int(4 * leaves))
+    count = min(num_clusters, len(anchors))
+    if is_batched(rng):
+        sources = anchors[rng.choice(len(anchors), count, replace=False)]
+    else:
+        sources = anchors[rng.sample(range(len(anchors)), count)]
+
+    offsets = cluster_kernel(radius, vertical_stretch, direction_bias)
+    leaf_vox = stamp_clusters(sources, offsets, sphere_density, shape, rng)
+    if trace is not None:
+        trace.count("leaf_clusters", count)
+        trace.count("leaf_samples", count * sphere_density * len(offsets))
+    return leaf_vox
+
+# === Sparse voxel store ===
+class SparseVoxels:
+    """Palette-indexed voxel grid that only stores occupied cells.
+
+    Cells are kept as sorted x-major linear indices with a parallel array of
+    palette indices, so memory scales with occupancy rather than grid volume.
+    """
+
+    def __init__(self, shape=(GRID, GRID, GRID)):
+        self.shape = tuple(int(n) for n in shape)
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.uint8)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.values.nbytes
+
+    def _find(self, indices):
+        pos = np.searchsorted(self.keys, indices)
+        found = pos < len(self.keys)
+        found[found] = self.keys[pos[found]] == indices[found]
+        return pos, found
+
+    def _insert(self, indices, values):
+        pos = np.searchsorted(self.keys, indices)
+        self.keys = np.insert(self.keys, pos, indices)
+        self.values = np.insert(self.values, pos, values)
+
+    def get(self, indices):
+        """Palette index at each linear index, 0 where empty"""
+        indices = np.asarray(indices, dtype=np.int64)
+        pos, found = self._find(indices)
+        out = np.zeros(len(indices), dtype=np.uint8)
+        out[found] = self.values[pos[found]]
+        return out
+
+    def fill(self, indices, values):
+        """Set empty cells only; the first entry for a repeated index wins"""
+        indices, first = np.unique(np.asarray(indices, dtype=np.int64), return_index=True)
+        values = np.asarray(values, dtype=np.uint8)[first]
+        _, found = self._find(indices)
+        self._insert(indices[~found], values[~found])
+
+    def overwrite(self, indices, values):
+        """Set cells whether or not they are occupied; the last entry for a repeated index wins"""
+        indices = np.asarray(indices, dtype=np.int64)[::-1]
+        indices, last = np.unique(indices, return_index=True)
+        values = np.asarray(values, dtype=np.uint8)[::-1][last]
+        pos, found = self._find(indices)
+        self.values[pos[found]] = values[found]
+        self._insert(indices[~found], values[~found])
+
+    def copy(self):
+        voxels = SparseVoxels(self.shape)
+        voxels.keys, voxels.values = self.keys.copy(), self.values.copy()
+        return voxels
+
+    def occupied(self):
+        """(n, 3) coordinates and palette indices of occupied cells in x-major order"""
+        xyz = np.stack(np.unravel_index(self.keys, self.shape), axis=1)
+        return xyz, self.values
+
+    def to_dense(self):
+        dense = np.zeros(self.shape, dtype=np.uint8)
+        dense.reshape(-1)[self.keys] = self.values
+        return dense
+
+    def hollow(self, shell=1):
+        """Copy without the cells more than `shell` voxels inside the surface.
+
+        Each pass keeps only cells whose six neighbours all survived the previous
+        pass (cells on the grid edge never do); what is left after `shell`
+        passes can never be seen and is dropped.
+        """
+        xyz, _ = self.occupied()
+        strides = (self.shape[1] * self.shape[2], self.shape[2], 1)
+        last = max(len(self.keys) - 1, 0)
+        inside = np.ones(len(self.keys), dtype=bool)
+        for _ in range(shell):
+            checkpoint()
+            deeper = inside.copy()
+            for axis in range(3):
+                for sign in (1, -1):
+                    neighbor = self.keys + sign * strides[axis]
+                    pos = np.minimum(np.searchsorted(self.keys, neighbor), last)
+                    edge = (xyz[:, axis] + sign < 0) | (xyz[:, axis] + sign >= self.shape[axis])
+                    deeper &= ~edge & (self.keys[pos] == neighbor) & inside[pos]
+            inside = deeper
+        voxels = SparseVoxels(self.shape)
+        voxels.keys, voxels.values = self.keys[~inside], self.values[~inside]
+        return voxels
+
+    def downsample(self, factor, threshold=0.0):
+        """Grid `factor` times coarser per axis, for distant levels of detail.
+
+        Each coarse cell takes the most common palette index of its occupied
+        children (the lowest on ties) and is kept when more than `threshold`
+        of its factor³ children are occupied; 0 keeps every cell the tree
+        touches, so the silhouette never loses thin branches.
+        """
+        voxels = SparseVoxels(tuple(-(-n // factor) for n in self.shape))
+        if len(self.keys) == 0:
+            return voxels
+        xyz, _ = self.occupied()
+        pairs, counts = np.unique(linear_indices(xyz // factor, voxels.shape) * 256 + self.values,
+                                  return_counts=True)
+        cells, colors = pairs // 256, (pairs % 256).astype(np.uint8)
+        order = np.lexsort((colors, -counts, cells))
+        cells, colors, counts = cells[order], colors[order], counts[order]
+        first = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        keep = np.add.reduceat(counts, first) > threshold * factor ** 3
+        voxels.keys, voxels.values = cells[first][keep], colors[first][keep]
+        return voxels
+
+# === .vox export ===
+VOX_VERSION = 150
+VOX_ANIMATION_VERSION = 200  # shape nodes with keyframed models
+VOX_MODEL_SIZE = 256
+
+def write_chunk_header(f, chunk_id, content_size, children_size=0):
+    f.write(chunk_id + struct.pack('<ii', content_size, children_size))
+
+def vox_dict(attributes):
+    out = [struct.pack('<i', len(attributes))]
+    for pair in attributes.items():
+        for text in pair:
+            data = str(text).encode()
+            out.append(struct.pack('<i', len(data)) + data)
+    return b"".join(out)
+
+def vox_chunk(chunk_id, content):
+    return chunk_id + struct.pack('<ii', len(content), 0) + content
+
+def vox_transform(node, child, translation=None, rotation=None, layer=0):
+    frame = {}
+    if rotation is not None:
+        frame["_r"] = rotation
+    if translation is not None:
+        frame["_t"] = " ".join(str(int(v)) for v in translation)
+    return vox_chunk(b'nTRN', struct.pack('<i', node) + vox_dict({})
+                     + struct.pack('<iiii', child, -1, layer, 1) + vox_dict(frame))
+
+def vox_group(node, children):
+    return vox_chunk(b'nGRP', struct.pack('<i', node) + vox_dict({})
+                     + struct.pack(f'<i{len(children)}i', len(children), *children))
+
+def vox_shape(node, model):
+    return vox_chunk(b'nSHP', struct.pack('<i', node) + vox_dict({}) + struct.pack('<ii', 1, model) + vox_dict({}))
+
+def vox_keyframes(node, models):
+    """nSHP showing model m from frame k on, for each (m, k) in `models`"""
+    return vox_chunk(b'nSHP', struct.pack('<i', node) + vox_dict({}) + struct.pack('<i', len(models))
+                     + b"".join(struct.pack('<i', model) + vox_dict({"_f": k}) for model, k in models))
+
+def export_space(voxels, swap_yz=False):
+    """(xyz, colors, size) of a SparseVoxels grid in .vox axes"""
+    xyz, colors = voxels.occupied()
+    size = list(voxels.shape)
+    if swap_yz:
+        xyz = xyz[:, [0, 2, 1]]
+        size[1], size[2] = size[2], size[1]
+    return xyz, colors, size
+
+def vox_models(xyz, colors, size):
+    """(origin, size, xyzi) for each model of an export-space grid.
+
+    A grid up to VOX_MODEL_SIZE per axis is one model. Larger worlds are cut
+    into VOX_MODEL_SIZE cubes with one stable sort by tile id, so voxels keep
+    their order within a tile, and only occupied tiles are returned.
+    """
+    size = np.asarray(size)
+    if size.max() <= VOX_MODEL_SIZE:
+        xyzi = np.empty((len(xyz), 4), dtype=np.uint8)
+        xyzi[:, :3] = xyz
+        xyzi[:, 3] = colors
+        return [(np.zeros(3, dtype=np.int64), size, xyzi)]
+    counts = -(-size // VOX_MODEL_SIZE)
+    tile = xyz // VOX_MODEL_SIZE
+    tile_id = (tile[:, 0] * counts[1] + tile[:, 1]) * counts[2] + tile[:, 2]
+    order = np.argsort(tile_id, kind="stable")
+    ids, starts = np.unique(tile_id[order], return_index=True)
+    models = []
+    for tid, a, b in zip(ids.tolist(), starts, np.append(starts[1:], len(order))):
+        pick = order[a:b]
+        origin = np.array(np.unravel_index(tid, counts)) * VOX_MODEL_SIZE
+        xyzi = np.empty((len(pick), 4), dtype=np.uint8)
+        xyzi[:, :3] = xyz[pick] - origin
+        xyzi[:, 3] = colors[pick]
+        models.append((origin, np.minimum(VOX_MODEL_SIZE, size - origin), xyzi))
+    return models
+
+def model_offsets(models, size):
+    """Translation of each model's center from the grid's footprint center on the ground.
+
+    MagicaVoxel pivots a model on size // 2, so pointing a transform at the
+    model's center puts its voxels back where they were in the grid.
+    """
+    footprint = np.array([size[0] // 2, size[1] // 2, 0])
+    return [origin + model_size // 2 - footprint for origin, model_size, _ in models]
+
+def write_vox_models(f, models, palette, scene=b"", version=VOX_VERSION):
+    """Stream SIZE/XYZI chunks for `models`, then `scene` chunks and the palette"""
+    rgba = np.asarray(palette, dtype=np.uint8).reshape(256, 4)
+    children_size = sum((12 + 12) + (12 + 4 + xyzi.nbytes) for _, _, xyzi in models) + len(scene) + (12 + rgba.nbytes)
+    f.write(b'VOX ' + struct.pack('<i', version))
+    write_chunk_header(f, b'MAIN', 0, children_size)
+    for _, model_size, xyzi in models:
+        checkpoint()
+        write_chunk_header(f, b'SIZE', 12)
+        f.write(struct.pack('<iii', *(int(n) for n in model_size)))
+        write_chunk_header(f, b'XYZI', 4 + xyzi.nbytes)
+        f.write(struct.pack('<i', len(xyzi)))
+        f.write(xyzi.tobytes())
+    f.write(scene)
+    write_chunk_header(f, b'RGBA', rgba.nbytes)
+    f.write(rgba.tobytes())
+
+def write_vox(f, voxels, palette, swap_yz=False):
+    """Stream a .vox of a SparseVoxels grid to the open file `f`.
+
+    Voxels are written in x-major order; `swap_yz` stores them as (x, z, y) for
+    generators that grow along the y axis. Grids up to VOX_MODEL_SIZE per axis
+    become one model; larger worlds are written as their occupied 256³ tiles
+    under an nTRN/nGRP/nSHP scene graph that lines them up.
+    """
+    xyz, colors, size = export_space(voxels, swap_yz)
+    models = vox_models(xyz, colors, size)
+    scene = b""
+    if max(size) > VOX_MODEL_SIZE:
+        nodes = [2 + 2 * i for i in range(len(models))]
+        scene = vox_transform(0, 1, layer=-1) + vox_group(1, nodes) + b"".join(
+            vox_transform(node, node + 1, offset) + vox_shape(node + 1, model)
+            for model, (node, offset) in enumerate(zip(nodes, model_offsets(models, size))))
+    write_vox_models(f, models, palette, scene)
+
+def write_vox_frames(f, frames, palette, swap_yz=False):
+    """Stream an animated .vox with one keyframe per SparseVoxels in `frames`.
+
+    Frames are cut into models like write_vox. Each model position gets one
+    shape node listing its model for every frame, with an empty model for
+    frames that have nothing there.
+    """
+    tiles, models = {}, []
+    for k, frame in enumerate(frames):
+        xyz, colors, size = export_space(frame, swap_yz)
+        for origin, model_size, xyzi in vox_models(xyz, colors, size):
+            tiles.setdefault(tuple(origin.tolist()), (origin, model_size, {}))[2][k] = len(models)
+            models.append((origin, model_size, xyzi))
+    placed = [tiles[key] for key in sorted(tiles)]
+    for origin, model_size, keyed in placed:
+        for k in range(len(frames)):
+            if k not in keyed:
+                keyed[k] = len(models)
+                models.append((origin, model_size, np.empty((0, 4), dtype=np.uint8)))
+    nodes = [2 + 2 * i for i in range(len(placed))]
+    scene = vox_transform(0, 1, layer=-1) + vox_group(1, nodes) + b"".join(
+        vox_transform(node, node + 1, offset) + vox_keyframes(node + 1, sorted((m, k) for k, m in keyed.items()))
+        for node, offset, (_, _, keyed) in zip(nodes, model_offsets(placed, size), placed))
+    write_vox_models(f, models, palette, scene, version=VOX_ANIMATION_VERSION)
+
+# === Mesh export ===
+MESH_FORMATS = ("obj", "glb")
+
+def greedy_quads(xyz, colors, size):
+    """Visible faces of an export-space grid merged into same-colored rectangles.
+
+    Faces against occupied neighbors are culled. For each of the six face
+    directions, all slices are merged at once: runs of equal color along u,
+    then runs with the same extent stacked along v. Returns (corners, normals,
+    colors, faces), with corners (n, 4, 3) counter-clockwise seen from outside
+    and `faces` the number of visible unit faces.
+    """
+    size = np.asarray(size, dtype=np.int64)
+    stride = np.array([size[1] * size[2], size[2], 1])
+    keys = xyz @ stride
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    all_corners, all_normals, all_colors, faces = [], [], [], 0
+    for axis in range(3):
+        u_axis, v_axis = (axis + 1) % 3, (axis + 2) % 3
+        for sign in (1, -1):
+            checkpoint()
+            neighbor = keys + sign * stride[axis]
+            found = sorted_keys[np.minimum(np.searchsorted(sorted_keys, neighbor), len(keys) - 1)] == neighbor
+            inside = (xyz[:, axis] + sign >= 0) & (xyz[:, axis] + sign < size[axis])
+            visible = ~(found & inside)
+            faces += int(visible.sum())
+            s, u, v, c = xyz[visible, axis], xyz[visible, u_axis], xyz[visible, v_axis], colors[visible]
+
+            o = np.lexsort((u, c, v, s))
+            s, u, v, c = s[o], u[o], v[o], c[o]
+            new = np.ones(len(s), dtype=bool)
+            new[1:] = (s[1:] != s[:-1]) | (v[1:] != v[:-1]) | (c[1:] != c[:-1]) | (u[1:] != u[:-1] + 1)
+            starts = np.flatnonzero(new)
+            w = np.diff(np.append(starts, len(s)))
+            s, u, v, c = s[starts], u[starts], v[starts], c[starts]
+
+            o = np.lexsort((v, c, w, u, s))
+            s, u, v, c, w = s[o], u[o], v[o], c[o], w[o]
+            new = np.ones(len(s), dtype=bool)
+            new[1:] = ((s[1:] != s[:-1]) | (u[1:] != u[:-1]) | (w[1:] != w[:-1]) | (c[1:] != c[:-1])
+                       | (v[1:] != v[:-1] + 1))
+            starts = np.flatnonzero(new)
+            h = np.diff(np.append(starts, len(s)))
+            s, u, v, c, w = s[starts], u[starts], v[starts], c[starts], w[starts]
+
+            corners = np.empty((len(s), 4, 3), dtype=np.int64)
+            corners[:, :, axis] = (s + (sign > 0))[:, None]
+            corners[:, :, u_axis] = np.stack([u, u + w, u + w, u], axis=1)
+            corners[:, :, v_axis] = np.stack([v, v, v + h, v + h], axis=1)
+            if sign < 0:
+                corners = corners[:, ::-1]
+            normal = np.zeros(3)
+            normal[axis] = sign
+            all_corners.append(corners)
+            all_normals.append(np.broadcast_to(normal, (len(s), 3)))
+            all_colors.append(c)
+    return np.concatenate(all_corners), np.concatenate(all_normals), np.concatenate(all_colors), faces
+
+def palette_png(palette):
+    """The palette as a 256x1 RGBA PNG; color index i samples pixel i - 1"""
+    from PIL import Image
+    out = io.BytesIO()
+    Image.frombytes("RGBA", (256, 1), np.asarray(palette, dtype=np.uint8).tobytes()).save(out, "PNG")
+    return out.getvalue()
+
+Y_UP = np.array([[1, 0, 0], [0, 0, -1], [0, 1, 0]], dtype=np.float64)  # (x, y, z) -> (x, z, -y)
+
+def to_y_up(points, size):
+    """Export-space points in y-up mesh units, centered on the grid's footprint"""
+    return (points - np.array([size[0] / 2, size[1] / 2, 0])) @ Y_UP
+
+def palette_u(colors):
+    """Texture u coordinate at the center of each color's palette pixel"""
+    return (np.asarray(colors, dtype=np.float64) - 0.5) / 256
+
+def mesh_arrays(corners, normals, colors, size):
+    """Flat triangle-list arrays for glTF: (positions, normals, uvs, indices)
+    with four vertices per quad"""
+    positions = to_y_up(corners.reshape(-1, 3), size).astype(np.float32)
+    normals = np.repeat(normals @ Y_UP, 4, axis=0).astype(np.float32)
+    uvs = np.zeros((len(positions), 2), dtype=np.float32)
+    uvs[:, 0] = np.repeat(palette_u(colors), 4)
+    uvs[:, 1] = 0.5
+    base = np.arange(len(corners), dtype=np.uint32)[:, None] * 4
+    indices = (base + np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)).reshape(-1)
+    return positions, normals, uvs, indices
+
+def write_obj(f, mtl_name, corners, normals, colors, size):
+    """Wavefront OBJ with shared vertices, one quad per merged face, one `vt` per
+    palette entry and one `vn` per face direction"""
+    extent = np.asarray(size, dtype=np.int64) + 1
+    keys, vertex = np.unique(corners.reshape(-1, 3) @ np.array([extent[1] * extent[2], extent[2], 1]),
+                             return_inverse=True)
+    points = np.stack(np.unravel_index(keys, tuple(extent)), axis=1)
+    directions, direction = np.unique(normals, axis=0, return_inverse=True)
+    lines = [f"mtllib {mtl_name}", "usemtl palette"]
+    lines += ["v %g %g %g" % tuple(p) for p in to_y_up(points, size).tolist()]
+    lines += ["vt %.6f 0.5" % u for u in palette_u(np.arange(1, 257)).tolist()]
+    lines += ["vn %g %g %g" % tuple(n) for n in (directions @ Y_UP).tolist()]
+    face = np.empty((len(corners), 4, 3), dtype=np.int64)
+    face[:, :, 0] = vertex.reshape(-1, 4) + 1
+    face[:, :, 1] = colors[:, None]
+    face[:, :, 2] = direction.reshape(-1, 1) + 1
+    lines += ["f %d/%d/%d %d/%d/%d %d/%d/%d %d/%d/%d" % tuple(row) for row in face.reshape(-1, 12).tolist()]
+    lines.append("")
+    f.write("\n".join(lines).encode())
+
+def write_glb(f, positions, normals, uvs, indices, png):
+    """Binary glTF 2.0 with one textured triangle mesh"""
+    views, blobs, offset = [], [], 0
+    for blob, target in ((indices, 34963), (positions, 34962), (normals, 34962), (uvs, 34962), (png, None)):
+        data = blob if isinstance(blob, bytes) else blob.tobytes()
+        view = {"buffer": 0, "byteOffset": offset, "byteLength": len(data)}
+        if target:
+            view["target"] = target
+        views.append(view)
+        data += b"\0" * (-len(data) % 4)
+        blobs.append(data)
+        offset += len(data)
+    gltf = {
+        "asset": {"version": "2.0", "generator": f"treegen-pinegen {GENERATOR_VERSION}"},
+        "scene": 0, "scenes": [{"nodes": [0]}], "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 1, "NORMAL": 2, "TEXCOORD_0": 3},
+                                    "indices": 0, "material": 0}]}],
+        "materials": [{"pbrMetallicRoughness": {"baseColorTexture": {"index": 0},
+                                                "metallicFactor": 0.0, "roughnessFactor": 1.0}}],
+        "textures": [{"sampler": 0, "source": 0}],
+        "samplers": [{"magFilter": 9728, "minFilter": 9728}],
+        "images": [{"bufferView": 4, "mimeType": "image/png"}],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5125, "count": len(indices), "type": "SCALAR"},
+            {"bufferView": 1, "componentType": 5126, "count": len(positions), "type": "VEC3",
+             "min": positions.min(axis=0).tolist(), "max": positions.max(axis=0).tolist()},
+            {"bufferView": 2, "componentType": 5126, "count": len(normals), "type": "VEC3"},
+            {"bufferView": 3, "componentType": 5126, "count": len(uvs), "type": "VEC2"},
+        ],
+        "bufferViews": views, "buffers": [{"byteLength": offset}],
+    }
+    header = json.dumps(gltf, separators=(",", ":")).encode()
+    header += b" " * (-len(header) % 4)
+    f.write(struct.pack("<4sII", b"glTF", 2, 12 + 8 + len(header) + 8 + offset))
+    f.write(struct.pack("<I4s", len(header), b"JSON") + header)
+    f.write(struct.pack("<I4s", offset, b"BIN\0"))
+    for data in blobs:
+        f.write(data)
+
+def export_meshes(filename, voxels, palette, swap_yz=False, formats=MESH_FORMATS):
+    """Greedy-mesh a grid next to `filename` (.obj/.mtl/_palette.png and/or .glb);
+    returns triangle-count statistics"""
+    xyz, colors, size = export_space(voxels, swap_yz)
+    stem = os.path.splitext(filename)[0]
+    if len(xyz) == 0:
+        return {"voxels": 0, "naive_triangles": 0, "culled_triangles": 0, "triangles": 0}
+    corners, normals, face_colors, faces = greedy_quads(xyz, colors, size)
+    png = palette_png(palette)
+    if "obj" in formats:
+        name = os.path.basename(stem)
+        with atomic_open(stem + "_palette.png") as f:
+            f.write(png)
+        with atomic_open(stem + ".mtl") as f:
+            f.write(f"newmtl palette\nKd 1 1 1\nmap_Kd {name}_palette.png\n".encode())
+        with atomic_open(stem + ".obj") as f:
+            write_obj(f, name + ".mtl", corners, normals, face_colors, size)
+    if "glb" in formats:
+        with atomic_open(stem + ".glb") as f:
+            write_glb(f, *mesh_arrays(corners, normals, face_colors, size), png)
+    return {"voxels": len(xyz), "naive_triangles": 12 * len(xyz), "culled_triangles": 2 * faces,
+            "triangles": 2 * len(corners)}
+
+# === Output sink ===
+MANIFEST_NAME = "manifest.jsonl"
+
+def temp_name(filename):
+    """Private sibling path to write `filename` through before renaming it into place"""
+    return f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+@contextlib.contextmanager
+def atomic_open(filename):
+    """Binary file that replaces `filename` only once the block completes"""
+    tmp = temp_name(filename)
+    try:
+        with open(tmp, "wb") as f:
+            yield f
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+class OutputSink:
+    """Collision-free writer of numbered outputs into one directory.
+
+    Names are reserved by creating <prefix><N>.vox with O_EXCL, so any number
+    of processes can share a directory without overwriting each other. Files
+    are written through a temp file and renamed over their reservation, and
+    each one is logged as a line of the directory's append-only manifest.
+    """
+
+    def __init__(self, directory, prefix="output"):
+        self.directory = directory or "."
+        self.prefix = prefix
+
+    def highest(self):
+        """Largest N among existing <prefix><N>.vox files, or 0"""
+        numbers = [0]
+        for name in os.listdir(self.directory):
+            number = name[len(self.prefix):-len(".vox")]
+            if name.startswith(self.prefix) and name.endswith(".vox") and number.isdigit():
+                numbers.append(int(number))
+        return max(numbers)
+
+    def reserve(self):
+        """Atomically claim the next free numbered filename"""
+        os.makedirs(self.directory, exist_ok=True)
+        n = self.highest() + 1
+        while True:
+            filename = os.path.join(self.directory, f"{self.prefix}{n}.vox")
+            try:
+                os.close(os.open(filename, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                return filename
+            except FileExistsError:
+                n += 1
+
+    def release(self, filename):
+        """Give back a reservation that was never written"""
+        if os.path.exists(filename) and os.path.getsize(filename) == 0:
+            os.remove(filename)
+
+    def record(self, entry):
+        """Append one JSON line to the manifest in a single locked write"""
+        os.makedirs(self.directory, exist_ok=True)
+        line = (json.dumps(entry, sort_keys=True, default=str) + "\n").encode()
+        fd = os.open(os.path.join(self.directory, MANIFEST_NAME), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+# === Projection previews ===
+PREVIEW_BACKGROUND = (236, 236, 236)
+
+def render_projection(voxels, palette, view="front", swap_yz=False):
+    """Orthographic RGB image of `voxels` as seen from the front or the top.
+
+    Each pixel takes the palette color of the nearest voxel, darkened with
+    depth. `swap_yz` views y-up trees in their exported z-up orientation.
+    """
+    xyz, colors = voxels.occupied()
+    sx, sy, sz = voxels.shape
+    if swap_yz:
+        xyz = xyz[:, [0, 2, 1]]
+        sy, sz = sz, sy
+    x, y, z = xyz.T
+    if view == "front":
+        col, row, depth, width, height, far = x, sz - 1 - z, y, sx, sz, sy
+    elif view == "top":
+        col, row, depth, width, height, far = x, y, sz - 1 - z, sx, sy, sz
+    else:
+        raise ValueError(f"Unknown view {view!r}")
+
+    pixel = row * width + col
+    order = np.lexsort((depth, pixel))
+    nearest = order[np.r_[True, pixel[order][1:] != pixel[order][:-1]]] if len(order) else order
+    shade = 1.0 - 0.5 * depth[nearest] / max(far - 1, 1)
+    # .vox color index i is stored in RGBA slot i - 1
+    rgb = np.asarray(palette, dtype=np.uint8).reshape(256, 4)[colors[nearest].astype(np.int64) - 1, :3]
+
+    image = np.empty((height * width, 3), dtype=np.uint8)
+    image[:] = PREVIEW_BACKGROUND
+    image[pixel[nearest]] = (rgb * shade[:, None]).astype(np.uint8)
+    from PIL import Image
+    return Image.fromarray(image.reshape(height, width, 3), "RGB")
+
+# === TREEGEN palette index map ===
+TREE_PALETTE_MAP = {
+    "tree_default.png": {"leaves": [9, 17], "trunk": [57, 65]},
+    "tree_basic.png":   {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
+    "autumn.png":       {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
+    "birch.png":        {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
+    "blossom.png":      {"leaves": list(range(9, 25)), "trunk": list(range(57, 65))},
+    "dead.png":         {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
+    "oak1.png":         {"leaves": list(range(9, 17)), "trunk": list(range(65, 73))},
+    "oak2.png":         {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
+    "tree_sapling.png": {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))}
+}
+
+# === PINEGEN palette index map ===
+PINE_PALETTE_MAP = {
+    "pine_default.png": {"leaves": [9, 17], "trunk": [57, 65]},
+    "pine_basic.png":   {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
+    "redpine.png":      {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
+    "pine_sapling.png": {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))},
+    "scotspine.png":    {"leaves": list(range(9, 17)), "trunk": list(range(57, 65))}
+}
+
+# === Palette registry ===
+PALETTE_KINDS = {"tree": ("tree_default.png", TREE_PALETTE_MAP), "pine": ("pine_default.png", PINE_PALETTE_MAP)}
+
+Palette = collections.namedtuple("Palette", "name colors leaves trunk source digest")
+
+def parse_palette_indices(spec):
+    """Palette indices from an index, a list, a JSON string of either or a range string such as "9-16,25" """
+    if isinstance(spec, str):
+        try:
+            spec = json.loads(spec)
+        except ValueError:
+            spec = parse_seeds(spec)
+    if isinstance(spec, int):
+        spec = [spec]
+    try:
+        indices = tuple(int(i) for i in spec)
+    except TypeError:
+        indices = ()
+    if not indices or not all(1 <= i <= 255 for i in indices):
+        raise ValueError(f"palette indices must be 1-255, got {spec!r}")
+    return indices
+
+def format_palette_indices(indices):
+    """Inverse of parse_palette_indices: consecutive runs as ranges, e.g. "9-16,25" """
+    runs = []
+    for i in indices:
+        if runs and i == runs[-1][1] + 1:
+            runs[-1][1] = i
+        else:
+            runs.append([i, i])
+    return ",".join(f"{lo}-{hi}" if hi > lo else str(lo) for lo, hi in runs)
+
+def mtime_ns(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+class PaletteRegistry:
+    """Palettes under palettes/<kind>, decoded once per process.
+
+    Leaf and trunk indices come from a sidecar <name>.json, else "leaves" /
+    "trunk" PNG text chunks, else the built-in maps above (the kind's default
+    palette's entry for unknown files). Entries are reloaded when the PNG or
+    its sidecar changes on disk, so edited palettes need no restart.
+    """
+
+    def __init__(self, root="palettes"):
+        self.root = root
+        self.entries = {}
+        self.listings = {}
+        self.lock = threading.Lock()
+
+    def names(self, kind):
+        """Sorted palette file names of a kind, rescanned when the directory changes"""
+        directory = resource_path(os.path.join(self.root, kind))
+        stamp = mtime_ns(directory)
+        with self.lock:
+            listing = self.listings.get(kind)
+            if listing is None or listing[0] != stamp:
+                listing = (stamp, sorted(f for f in os.listdir(directory) if f.endswith(".png")))
+                self.listings[kind] = listing
+        return list(listing[1])
+
+    def get(self, palette_name, kind=None):
+        """The Palette for "<kind>/<file>.png"; `kind` picks the fallback index map
+        and defaults to the first path component"""
+        kind = kind or palette_name.replace("\\", "/").split("/")[0]
+        path = resource_path(os.path.join(self.root, palette_name))
+        sidecar = os.path.splitext(path)[0] + ".json"
+        stamp = (mtime_ns(path), mtime_ns(sidecar))
+        with self.lock:
+            cached = self.entries.get((palette_name, kind))
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        entry = self._load(palette_name, kind, path, sidecar)
+        with self.lock:
+            self.entries[(palette_name, kind)] = (stamp, entry)
+        return entry
+
+    def _load(self, palette_name, kind, path, sidecar):
+        from PIL import Image
+        with open(path, "rb") as f:
+            data = f.read()
+        image = Image.open(io.BytesIO(data))
+        text = dict(getattr(image, "text", {}))
+        colors = np.asarray(image.convert("RGBA"), dtype=np.uint8).reshape(-1, 4)
+        if len(colors) != 256:
+            raise ValueError("Palette must be exactly 256 pixels wide")
+        colors.flags.writeable = False
+
+        meta = {}
+        if os.path.exists(sidecar):
+            with open(sidecar) as f:
+                meta = json.load(f)
+        default_name, builtin = PALETTE_KINDS.get(kind, PALETTE_KINDS["tree"])
+        fallback = builtin.get(os.path.basename(palette_name))
+        indices, sources = {}, set()
+        for part in ("leaves", "trunk"):
+            for source, spec in (("sidecar", meta.get(part)), ("png", text.get(part)),
+                                 ("builtin", fallback and fallback[part]),
+                                 ("default", builtin[default_name][part])):
+                if spec is not None:
+                    try:
+                        indices[part] = parse_palette_indices(spec)
+                    except ValueError as e:
+                        raise ValueError(f"{palette_name} {part}: {e}") from None
+                    sources.add(source)
+                    break
+        return Palette(palette_name, colors, indices["leaves"], indices["trunk"],
+                       "+".join(sorted(sources)), hashlib.sha256(data).hexdigest())
+
+PALETTES = PaletteRegistry()
+
+# === Skeletons ===
+# One row per drawn segment, in the order the legacy recursion drew them
+SEGMENT_DTYPE = np.dtype([
+    ("start", np.float64, 3), ("end", np.float64, 3),
+    ("r0", np.float64), ("r1", np.float64), ("level", np.int32)
+])
+
+def scale_segments(segments, scale):
+    """Segment table shrunk `scale` times for a coarser grid"""
+    if scale == 1:
+        return segments
+    segments = segments.copy()
+    for field in ("start", "end", "r0", "r1"):
+        segments[field] /= scale
+    return segments
+
+def normalize_rows(v, fallback):
+    l = np.sqrt((v * v).sum(axis=1, keepdims=True))
+    return np.where(l > 0, v / np.where(l > 0, l, 1), fallback)
+
+def treegen_skeleton(params, rng):
+    """Segment table and leaf anchors of a treegen tree.
+
+    A random.Random grows the tree depth first, drawing random numbers in the
+    same order as the old recursive `branches`. With a NumPy `rng` every
+    iteration level is grown at once.
+    """
+    iterations = params['iterations']
+    size = 150 * params['size'] / iterations
+    gTrunkSize = params['trunksize'] * params['size'] * 6
+    wide = min(params['wide'], 0.95)
+    gBranchLength0 = size * (1 - wide)
+    gBranchLength1 = size * wide
+
+    def normalize(x, y, z):
+        l = math.sqrt(x*x + y*y + z*z)
+        return (x/l, y/l, z/l) if l > 0 else (0, 0, 1)
+
+    def get_branch_length(i):
+        t = math.sqrt((i - 1) / iterations)
+        return gBranchLength0 + t * (gBranchLength1 - gBranchLength0)
+
+    def get_branch_size(i):
+        t = math.sqrt((i - 1) / iterations)
+        return (1 - t) * gTrunkSize
+
+    def get_branch_angle(i):
+        t = math.sqrt((i - 1) / iterations)
+        return 2.0 * params['spread'] * t
+
+    def get_branch_prob(i):
+        return math.sqrt((i - 1) / iterations)
+
+    width, depth, _ = world_shape(params)
+    if is_batched(rng):
+        pos = np.array([[width//2, depth//2, 0]], dtype=np.float64)
+        dirs = np.array([[0.0, 0.0, 1.0]])
+        levels = []
+        i = 1
+        while True:
+            ends = pos + dirs * get_branch_length(i)
+            level = np.zeros(len(pos), dtype=SEGMENT_DTYPE)
+            level["start"], level["end"], level["level"] = pos, ends, i
+            level["r0"], level["r1"] = get_branch_size(i), get_branch_size(i + 1)
+            levels.append(level)
+            if not i < iterations:
+                anchors = np.stack([ends, (pos + ends) / 2], axis=1).reshape(-1, 3)
+                return np.concatenate(levels), anchors
+
+            split = rng.random(len(pos)) < get_branch_prob(i)
+            var = np.where(split, get_branch_angle(i), i * 0.2 * params['twisted'])
+            parent = np.repeat(np.arange(len(pos)), np.where(split, 2, 1))
+            jitter = rng.uniform(-1.0, 1.0, (len(parent), 3)) * var[parent, None]
+            dirs = normalize_rows(dirs[parent] + jitter, (0.0, 0.0, 1.0))
+            pos = ends[parent]
+            i += 1
+
+    segments, anchors = [], []
+    # Plain entries are branches to draw, entries with (var, b) still owe b children
+    stack = [(width//2, depth//2, 0, 0, 0, 1, 1)]
+    while stack:
+        item = stack.pop()
+        if len(item) == 9:
+            x1, y1, z1, dx, dy, dz, i, var, b = item
+            if b > 1:
+                stack.append((x1, y1, z1, dx, dy, dz, i, var, b - 1))
+            dx2 = dx + rng.uniform(-var, var)
+            dy2 = dy + rng.uniform(-var, var)
+            dz2 = dz + rng.uniform(-var, var)
+            dx2, dy2, dz2 = normalize(dx2, dy2, dz2)
+            stack.append((x1, y1, z1, dx2, dy2, dz2, i + 1))
+            continue
+
+        x, y, z, dx, dy, dz, i = item
+        l = get_branch_length(i)
+        x1 = x + dx * l
+        y1 = y + dy * l
+        z1 = z + dz * l
+        segments.append(((x, y, z), (x1, y1, z1), get_branch_size(i), get_branch_size(i+1), i))
+
+        if i < iterations:
+            b = 1
+            var = i * 0.2 * params['twisted']
+            if rng.random() < get_branch_prob(i):
+                b = 2
+                var = get_branch_angle(i)
+            stack.append((x1, y1, z1, dx, dy, dz, i, var, b))
+        else:
+            anchors.append((x1, y1, z1))
+            anchors.append(((x + x1)/2, (y + y1)/2, (z + z1)/2))
+
+    return np.array(segments, dtype=SEGMENT_DTYPE), np.array(anchors, dtype=np.float64).reshape(-1, 3)
+
+def pinegen_skeleton(params, rng):
+    """Segment table and leaf anchors of a pinegen tree.
+
+    A random.Random draws random numbers in the same order as the old
+    recursive `generate_branches`. With a NumPy `rng` the trunk levels are
+    grown first and then every side branch advances one step at a time
+    together.
+    """
+    size = clamp(params["size"], 0.1, 3.0)
+    twisted = clamp(params["twisted"], 0, 3)
+    trunkheight = params["trunkheight"] * 10
+    density = clamp(params["branchdensity"], 0, 3) * 30
+    branchlength = clamp(params["branchlength"], 0, 3) * size * 20
+    branchdir = clamp(params["branchdir"], -5, 5)
+    trunk_width = size * params.get("trunksize", 2)
+    max_iter = math.floor(100 * size / 5)
+    fixed_size = 5
+    twisted = twisted / max_iter
+
+    def normalize(x, y, z):
+        l = math.sqrt(x*x + y*y + z*z)
+        return (x/l, y/l, z/l) if l > 0 else (0, 1, 0)
+
+    def get_branch_size(i):
+        t = (i - 1) / max_iter
+        return (1 - t * t) * trunk_width
+
+    segments, anchors = [], []
+    width, depth, _ = world_shape(params)
+
+    if is_batched(rng):
+        p = np.array([width//2, 0, depth//2], dtype=np.float64)
+        d = np.array([0.0, 1.0, 0.0])
+        starts, dirs, lengths, twig_levels = [], [], [], []
+        i = 1
+        while True:
+            p1 = p + d * fixed_size
+            s0 = get_branch_size(i)
+            segments.append((p, p1, s0, s0, i))
+            if p1[1] > trunkheight:
+                b = int((1.0 - i / max_iter) * density + 1)
+                a = rng.uniform(0.0, math.tau, b)
+                idir = np.stack([np.cos(a), rng.uniform(0.5, 1.0, b) * branchdir, np.sin(a)], axis=1)
+                dirs.append(normalize_rows(idir, (0.0, 1.0, 0.0)))
+                lengths.append((1.0 - i / max_iter) * branchlength * rng.uniform(0.5, 1.5, b) + 3)
+                starts.append(p + (p1 - p) * rng.uniform(0.0, 1.0, (b, 1)))
+                twig_levels.append(np.full(b, i))
+            if not i < max_iter:
+                anchors.extend([p1, (p + p1) / 2])
+                break
+            var = i * 0.1 * twisted
+            d = normalize_rows((d + rng.uniform(-var, var, 3))[None, :], (0.0, 1.0, 0.0))[0]
+            p = p1
+            i += 1
+
+        trunk = np.array(segments, dtype=SEGMENT_DTYPE)
+        if not starts:
+            return trunk, np.array(anchors)
+        pos, dirs = np.concatenate(starts), np.concatenate(dirs)
+        twig_levels = np.concatenate(twig_levels)
+        lengths = np.concatenate(lengths)
+        steps = np.ceil(lengths / 3).astype(np.int64)
+        step_length = (lengths / steps)[:, None]
+        twigs = []
+        for k in range(steps.max()):
+            act = np.flatnonzero(steps > k)
+            p1 = pos[act] + dirs[act] * step_length[act]
+            inv = 1 / steps[act, None]
+            turn = rng.uniform(-1.0, 1.0, (len(act), 3)) * inv
+            turn[:, 1] += 0.4 * inv[:, 0]
+            dirs[act] = normalize_rows(dirs[act] + turn, (0.0, 1.0, 0.0))
+            twig = np.zeros(len(act), dtype=SEGMENT_DTYPE)
+            twig["start"], twig["end"], twig["level"] = pos[act], p1, twig_levels[act]
+            twigs.append(twig)
+            anchors.extend(p1)
+            pos[act] = p1
+        return np.concatenate([trunk] + twigs), np.array(anchors)
+
+    def branch(x, y, z, dx, dy, dz, l, level):
+        steps = math.ceil(l / 3)
+        l = l / steps
+        for _ in range(steps):
+            x1 = x + dx * l
+            y1 = y + dy * l
+            z1 = z + dz * l
+            dx += rng.uniform(-1/steps, 1/steps)
+            dy += rng.uniform(-1/steps, 1/steps) + 0.4 / steps
+            dz += rng.uniform(-1/steps, 1/steps)
+            dx, dy, dz = normalize(dx, dy, dz)
+            segments.append(((x, y, z), (x1, y1, z1), 0, 0, level))
+            anchors.append((x1, y1, z1))
+            x, y, z = x1, y1, z1
+
+    x, y, z, dx, dy, dz = width//2, 0, depth//2, 0, 1, 0
+    i = 1
+    while True:
+        l = fixed_size
+        s0 = get_branch_size(i)
+        x1 = x + dx * l
+        y1 = y + dy * l
+        z1 = z + dz * l
+        segments.append(((x, y, z), (x1, y1, z1), s0, s0, i))
+
+        if y1 > trunkheight:
+            b = (1.0 - i / max_iter) * density + 1
+            for _ in range(int(b)):
+                a = rng.uniform(0.0, math.tau)
+                idx = math.cos(a)
+                idy = rng.uniform(0.5, 1.0) * branchdir
+                idz = math.sin(a)
+                idx, idy, idz = normalize(idx, idy, idz)
+                il = (1.0 - i / max_iter) * branchlength * rng.uniform(0.5, 1.5)
+                t = rng.uniform(0.0, 1.0)
+                x2 = x + (x1 - x) * t
+                y2 = y + (y1 - y) * t
+                z2 = z + (z1 - z) * t
+                branch(x2, y2, z2, idx, idy, idz, il + 3, i)
+
+        if not i < max_iter:
+            anchors.append((x1, y1, z1))
+            anchors.append(((x + x1)/2, (y + y1)/2, (z + z1)/2))
+            break
+        var = i * 0.1 * twisted
+        dx2 = dx + rng.uniform(-var, var)
+        dy2 = dy + rng.uniform(-var, var)
+        dz2 = dz + rng.uniform(-var, var)
+        dx, dy, dz = normalize(dx2, dy2, dz2)
+        x, y, z = x1, y1, z1
+        i += 1
+
+    return np.array(segments, dtype=SEGMENT_DTYPE), np.array(anchors, dtype=np.float64).reshape(-1, 3)
+
+# === Progress reporting ===
+class GenerationCancelled(Exception):
+    """Raised from a progress callback or a checkpoint to abort a generation"""
+
+_cancel = threading.local()
+
+def checkpoint():
+    """Run this thread's cancel check, if one is installed; long batched loops
+    call it once per batch so a job can be aborted mid-stage"""
+    check = getattr(_cancel, "check", None)
+    if check is not None:
+        check()
+
+@contextlib.contextmanager
+def cancellable(check):
+    """Install `check` for every checkpoint() this thread reaches inside the block"""
+    previous = getattr(_cancel, "check", None)
+    _cancel.check = check
+    try:
+        yield
+    finally:
+        _cancel.check = previous
+
+def no_progress(stage, fraction=0.0):
+    pass
+
+def overall_progress(stage, fraction=0.0):
+    """Fraction of a whole generation done at `fraction` of the way through `stage`"""
+    return (GENERATION_STAGES.index(stage) + fraction) / len(GENERATION_STAGES)
+
+# === Instrumentation ===
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+class GenerationTrace:
+    """Observer recording what one generation did.
+
+    Pass one as `trace=` to a build or generate function to collect seconds
+    per stage (excluding nested stages), counters and the stages that were
+    cache hits. With the default `trace=None` nothing is measured.
+    """
+
+    def __init__(self):
+        self.spans = {}
+        self.counters = {}
+        self.cached = []
+        self.nested = []
+
+    def count(self, name, n):
+        self.counters[name] = self.counters.get(name, 0) + int(n)
+
+    def hit(self, stage):
+        self.cached.append(stage)
+
+    @contextlib.contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        self.nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.spans[stage] = self.spans.get(stage, 0.0) + elapsed - self.nested.pop()
+            if self.nested:
+                self.nested[-1] += elapsed
+
+    def summary(self):
+        """One-line stage breakdown for status bars"""
+        parts = [f"{stage} {seconds:.2f}s" for stage, seconds in self.spans.items()]
+        if self.cached:
+            parts.append("cached: " + ", ".join(self.cached))
+        return " · ".join(parts)
+
+    def as_dict(self):
+        return {"spans": self.spans, "counters": self.counters, "cached": self.cached,
+                "peak_rss_mb": peak_rss_mb()}
+
+def trace_span(trace, stage):
+    return trace.span(stage) if trace is not None else contextlib.nullcontext()
+
+# === Default parameters ===
+TREEGEN_DEFAULTS = {
+    "size": 1.0, "trunksize": 1.0, "spread": 0.5, "twisted": 0.5, "leaves": 1.0,
+    "gravity": 0.0, "iterations": 12, "wide": 0.5, "seed": 1, "rng": "legacy",
+    "colorize": "auto", "world": WORLD_SIZES[0], "hollow": 0
+}
+
+PINEGEN_DEFAULTS = {
+    "size": 1.0, "twisted": 0.5, "trunksize": 2.0, "trunkheight": 1.0, "branchdensity": 1.0,
+    "branchlength": 1.0, "branchdir": -0.5, "leaves": 1.0, "leaf_radius": 2.0,
+    "leaf_stretch": 1.5, "leaf_bias": -0.3, "seed": 1, "rng": "legacy",
+    "colorize": "auto", "world": WORLD_SIZES[0], "hollow": 0
+}
+
+# === Result cache ===
+def normalize_params(params, defaults):
+    """`params` over `defaults` with numbers as floats, so 1 and 1.0 hash alike"""
+    merged = dict(defaults, **params)
+    return {k: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+            for k, v in merged.items()}
+
+class ResultCache:
+    """Content-addressed on-disk store of finished .vox files.
+
+    Entries are keyed on everything that determines the output: generator,
+    GENERATOR_VERSION, normalized params and the palette file's bytes and index
+    map. Hits refresh the entry's mtime and the oldest entries are evicted once
+    the store grows past `max_bytes`. With `link` hits are hard-linked into
+    place (falling back to a copy), otherwise copied so edits to the output
+    can never reach the cache.
+    """
+
+    DEFAULTS = {"treegen": (TREEGEN_DEFAULTS, "tree"),
+                "pinegen": (PINEGEN_DEFAULTS, "pine")}
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, link=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, generator, params, palette_name):
+        defaults, kind = self.DEFAULTS[generator]
+        palette = PALETTES.get(palette_name, kind)
+        record = {
+            "generator": generator, "version": GENERATOR_VERSION, "grid": GRID,
+            "params": normalize_params(params, defaults), "palette": palette.digest,
+            "palette_map": {"leaves": list(palette.leaves), "trunk": list(palette.trunk)},
+        }
+        return hashlib.sha256(json.dumps(record, sort_keys=True).encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".vox")
+
+    def fetch(self, key, filename):
+        """Materialize a cached result at `filename`; False on a miss"""
+        cached = self.path(key)
+        tmp = temp_name(filename)
+        try:
+            os.utime(cached)
+            if self.link:
+                try:
+                    os.link(cached, tmp)
+                except FileNotFoundError:
+                    raise
+                except OSError:
+                    shutil.copyfile(cached, tmp)
+            else:
+                shutil.copyfile(cached, tmp)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+        os.replace(tmp, filename)
+        self.hits += 1
+        return True
+
+    def store(self, key, filename):
+        """Copy a freshly written result into the cache, then evict down to size"""
+        cached = self.path(key)
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        tmp = temp_name(cached)
+        try:
+            shutil.copyfile(filename, tmp)
+            os.replace(tmp, cached)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self.evict()
+
+    def entries(self):
+        """(mtime, size, path) for every cached file, oldest first"""
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".vox"):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    found.append((st.st_mtime, st.st_size, entry.path))
+        found.sort()
+        return found
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def stats(self):
+        entries = self.entries()
+        return {"hits": self.hits, "misses": self.misses, "entries": len(entries),
+                "bytes": sum(size for _, size, _ in entries)}
+
+# === Stage memoization ===
+TREEGEN_STAGE_PARAMS = {
+    "skeleton": ("seed", "rng", "world", "size", "trunksize", "spread", "twisted", "iterations", "wide"),
+    "leaves": ("leaves", "gravity", "colorize"),
+}
+
+PINEGEN_STAGE_PARAMS = {
+    "skeleton": ("seed", "rng", "world", "size", "twisted", "trunksize", "trunkheight",
+                 "branchdensity", "branchlength", "branchdir"),
+    "leaves": ("leaves", "leaf_radius", "leaf_stretch", "leaf_bias"),
+    "shuffle": ("colorize",),
+}
+
+def stage_key(params, names):
+    return tuple((name, params.get(name)) for name in names)
+
+def stage_nbytes(value):
+    if isinstance(value, tuple):
+        return sum(stage_nbytes(v) for v in value)
+    return getattr(value, "nbytes", 0)
+
+class StageCache:
+    """In-memory LRU of intermediate pipeline results.
+
+    Each stage is keyed on the stage key of everything upstream plus the params
+    it reads itself, so editing a downstream param only recomputes that stage
+    and the ones after it. Cached arrays are made read-only and shared.
+    """
+
+    def __init__(self, max_bytes=STAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, stage, key, compute, trace=None):
+        """Cached result of `stage` for `key`, calling `compute()` on a miss"""
+        key = (stage, key)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                if trace is not None:
+                    trace.hit(stage)
+                return self.entries[key][0]
+            self.misses += 1
+        if trace is None:
+            value = compute()
+        else:
+            with trace.span(stage):
+                value = compute()
+        for array in value if isinstance(value, tuple) else (value,):
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+        size = stage_nbytes(value)
+        with self.lock:
+            if size <= self.max_bytes and key not in self.entries:
+                self.entries[key] = (value, size)
+                self.nbytes += size
+                while self.nbytes > self.max_bytes:
+                    _, (_, dropped) = self.entries.popitem(last=False)
+                    self.nbytes -= dropped
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+# Shared by the GUI's preview and generate paths, where edits rebuild the same
+# seed; batch, forest, explore and serve build each seed once and pass nothing.
+STAGES = StageCache()
+
+def build_treegen_voxels(params, palette_name, progress=None, scale=1, stages=None, trace=None):
+    """Paint a treegen tree into a SparseVoxels grid; returns (voxels, palette).
+
+    `scale` > 1 builds a coarse preview on a grid `scale` times smaller per
+    axis, with the batched leaf walk standing in for the slow legacy one.
+    Stages are memoized in `stages` when given (e.g. STAGES; otherwise
+    nothing is kept) and measured into `trace`, a GenerationTrace, when one
+    is given.
+    """
+    report = progress or no_progress
+    stages = StageCache(0) if stages is None else stages
+    report("skeleton")
+
+    palette_entry = PALETTES.get(palette_name, "tree")
+    palette = palette_entry.colors
+    leaf_indices = palette_entry.leaves
+    trunk_indices = palette_entry.trunk
+    shape = tuple(n // scale for n in world_shape(params))
+    unique = unique_colors(params)
+
+    def skeleton():
+        rng = make_rng(params, params['seed'])
+        segments, anchors = treegen_skeleton(params, rng)
+        if trace is not None:
+            trace.count("segments", len(segments))
+            trace.count("leaf_anchors", len(anchors))
+        return segments, anchors, rng_state(rng)
+
+    skeleton_key = ("treegen", stage_key(params, TREEGEN_STAGE_PARAMS["skeleton"]))
+    segments, gLeaves, skeleton_state = stages.get("skeleton", skeleton_key, skeleton, trace)
+
+    def add_leaves():
+        rng = restore_rng(params, skeleton_state)
+        if trace is not None:
+            trace.count("leaf_walk_steps", len(gLeaves) * int(5 * params['leaves']) * int(50 * params['leaves']))
+        if is_batched(rng) or scale > 1:
+            walk_rng = rng if is_batched(rng) else np.random.default_rng(int(params['seed']))
+            walked = random_walks(gLeaves, int(5 * params['leaves']), int(50 * params['leaves']),
+                                  params['gravity'], walk_rng)
+            leaf_order = color_order(linear_indices(walked // scale, shape), walk_rng, unique)
+            return leaf_order, rng_state(rng)
+
+        leaf_voxels = []
+        for n, pos in enumerate(gLeaves):
+            if n % 64 == 0:
+                report("leaves", n / len(gLeaves))
+            x1, y1, z1 = map(int, pos)
+            for _ in range(int(5 * params['leaves'])):
+                x2, y2, z2 = x1, y1, z1
+                for _ in range(int(50 * params['leaves'])):
+                    leaf_voxels.append((x2, y2, z2))
+                    d = rng.randint(1, 6)
+                    if d == 1: x2 -= 1
+                    elif d == 2: x2 += 1
+                    elif d in (3, 4):
+                        z2 += 1 if rng.uniform(-1, 1) < params['gravity'] else -1
+                    elif d == 5: y2 -= 1
+                    else: y2 += 1
+
+        return color_order(linear_indices(leaf_voxels, shape), rng, unique), rng_state(rng)
+
+    report("leaves")
+    leaves_key = skeleton_key + (stage_key(params, TREEGEN_STAGE_PARAMS["leaves"]), scale)
+    leaf_order, leaves_state = stages.get("leaves", leaves_key, add_leaves, trace)
+
+    report("colorize")
+
+    def trunk_order():
+        trunk = stages.get("trunk", skeleton_key + (scale,),
+                           lambda: rasterize_segments(scale_segments(segments, scale), shape, trace), trace)
+        if trace is not None:
+            trace.count("trunk_voxels_raw", len(trunk))
+            trace.count("leaf_voxels_raw", len(leaf_order))
+        return color_order(trunk, restore_rng(params, leaves_state), unique)
+
+    def colorize():
+        voxels = SparseVoxels(shape)
+        paint_cycled(voxels, leaf_order, leaf_indices, overwrite=False)
+        paint_cycled(voxels, stages.get("shuffle", leaves_key, trunk_order, trace), trunk_indices)
+        return voxels
+
+    voxels = stages.get("colorize", leaves_key + (tuple(leaf_indices), tuple(trunk_indices)), colorize, trace)
+    if trace is not None:
+        trace.count("voxels", len(voxels))
+    return voxels.copy(), palette
+
+def generate_treegen_tree(params, palette_name, filename=None, progress=None, cache=None, trace=None, meshes=(),
+                          lods=(), lod_threshold=LOD_THRESHOLD, stages=None):
+    return save_tree("treegen", params, palette_name, filename, progress, cache, trace, meshes, lods, lod_threshold,
+                     stages)
+
+def build_pinegen_voxels(params, palette_name, progress=None, scale=1, stages=None, trace=None):
+    """Paint a pinegen tree into a SparseVoxels grid; returns (voxels, palette).
+
+    `scale` > 1 builds a coarse preview on a grid `scale` times smaller per axis.
+    Stages are memoized in `stages` when given (e.g. STAGES; otherwise
+    nothing is kept) and measured into `trace`, a GenerationTrace, when one
+    is given.
+    """
+    report = progress or no_progress
+    stages = StageCache(0) if stages is None else stages
+    report("skeleton")
+
+    # Load palette
+    palette_entry = PALETTES.get(palette_name, "pine")
+    palette = palette_entry.colors
+    trunk_indices = palette_entry.trunk
+    leaf_indices = palette_entry.leaves
+
+    width, depth, height = world_shape(params)
+    shape = (width, height, depth)
+    voxel_shape = tuple(n // scale for n in shape)
+    unique = unique_colors(params)
+
+    def skeleton():
+        rng = make_rng(params, int(params["seed"]))
+        segments, anchors = pinegen_skeleton(params, rng)
+        if trace is not None:
+            trace.count("segments", len(segments))
+            trace.count("leaf_anchors", len(anchors))
+        return segments, anchors, rng_state(rng)
+
+    skeleton_key = ("pinegen", stage_key(params, PINEGEN_STAGE_PARAMS["skeleton"]))
+    segments, gLeaves, skeleton_state = stages.get("skeleton", skeleton_key, skeleton, trace)
+
+    def generate_leaves():
+        rng = restore_rng(params, skeleton_state)
+        leaf_vox = pinegen_leaves(params, gLeaves, shape, rng, trace)
+        if scale > 1:
+            leaf_vox = downsample_indices(leaf_vox, shape, scale)
+        return leaf_vox, rng_state(rng)
+
+    report("leaves")
+    leaves_key = skeleton_key + (stage_key(params, PINEGEN_STAGE_PARAMS["leaves"]), scale)
+    leaf_vox, leaves_state = stages.get("leaves", leaves_key, generate_leaves, trace)
+
+    report("colorize")
+    shuffle_key = leaves_key + (stage_key(params, PINEGEN_STAGE_PARAMS["shuffle"]),)
+
+    def shuffle():
+        rng = restore_rng(params, leaves_state)
+        trunk = stages.get("trunk", skeleton_key + (scale,),
+                           lambda: rasterize_segments(scale_segments(segments, scale), voxel_shape, trace), trace)
+        if trace is not None:
+            trace.count("trunk_voxels_raw", len(trunk))
+            trace.count("leaf_voxels_raw", len(leaf_vox))
+        return color_order(trunk, rng, unique), color_order(leaf_vox, rng, unique)
+
+    def colorize():
+        trunk_order, leaf_order = stages.get("shuffle", shuffle_key, shuffle, trace)
+        voxels = SparseVoxels(voxel_shape)
+        paint_cycled(voxels, trunk_order, trunk_indices)
+        paint_cycled(voxels, leaf_order, leaf_indices, overwrite=False)
+        return voxels
+
+    voxels = stages.get("colorize", shuffle_key + (tuple(leaf_indices), tuple(trunk_indices)), colorize, trace)
+    if trace is not None:
+        trace.count("voxels", len(voxels))
+    return voxels.copy(), palette
+
+def generate_pinegen_tree(params, palette_name, filename=None, progress=None, cache=None, trace=None, meshes=(),
+                          lods=(), lod_threshold=LOD_THRESHOLD, stages=None):
+    return save_tree("pinegen", params, palette_name, filename, progress, cache, trace, meshes, lods, lod_threshold,
+                     stages)
+
+# === Saving ===
+OUTPUTS = {
+    "treegen": (build_treegen_voxels, False, os.path.join("output", "tree"), "treegen_output"),
+    "pinegen": (build_pinegen_voxels, True, os.path.join("output", "pine"), "pinegen_output"),
+}
+
+def export_lods(filename, voxels, palette, swap_yz=False, factors=LOD_FACTORS, threshold=LOD_THRESHOLD, shell=0):
+    """Write <stem>_lod<F>.vox next to `filename` for each downsampling factor.
+
+    Every level is built from the full-resolution grid rather than the previous
+    level, so majority colors and silhouettes don't drift as factors grow. A
+    hollow `shell` is scaled down per level, rounding up. Returns
+    [{"factor", "file", "voxels"}] per level.
+    """
+    stem = os.path.splitext(filename)[0]
+    levels = []
+    for factor in factors:
+        checkpoint()
+        lod = voxels.downsample(factor, threshold)
+        if shell:
+            lod = lod.hollow(-(-shell // factor))
+        path = f"{stem}_lod{factor}.vox"
+        with atomic_open(path) as f:
+            write_vox(f, lod, palette, swap_yz=swap_yz)
+        levels.append({"factor": factor, "file": os.path.basename(path), "voxels": len(lod)})
+    return levels
+
+def save_tree(generator, params, palette_name, filename=None, progress=None, cache=None, trace=None, meshes=(),
+              lods=(), lod_threshold=LOD_THRESHOLD, stages=None):
+    """Build and export one tree; returns the filename written.
+
+    Without `filename` the next free <generator>_output<N>.vox in the
+    generator's output directory is reserved. Either way the .vox is written
+    through an atomic rename and logged in its directory's manifest.
+    `meshes` names MESH_FORMATS to also write next to the .vox; those need the
+    voxels, so a cached .vox is not reused for them. A "hollow" shell
+    thickness in `params` drops unseen interior voxels from the .vox only.
+    `lods` lists downsampling factors for coarser <stem>_lod<F>.vox copies,
+    which likewise bypass the cache; see SparseVoxels.downsample for
+    `lod_threshold`. `stages` is passed on to the builder.
+    """
+    build, swap_yz, output_dir, prefix = OUTPUTS[generator]
+    start = time.perf_counter()
+    if filename is None:
+        sink = OutputSink(output_dir, prefix)
+        filename = sink.reserve()
+    else:
+        sink = OutputSink(os.path.dirname(filename))
+        os.makedirs(sink.directory, exist_ok=True)
+
+    try:
+        key = cache.key(generator, params, palette_name) if cache is not None else None
+        cached = cache is not None and not meshes and not lods and cache.fetch(key, filename)
+        mesh = hollowed = levels = None
+        if cached:
+            if trace is not None:
+                trace.hit("result")
+        else:
+            voxels, palette = build(params, palette_name, progress, stages=stages, trace=trace)
+            (progress or no_progress)("export")
+            solid = voxels
+            shell = int(clamp(params.get("hollow", 0), 0, MAX_HOLLOW))
+            if shell:
+                with trace_span(trace, "hollow"):
+                    voxels = solid.hollow(shell)
+                hollowed = {"shell": shell, "voxels_before": len(solid), "voxels_after": len(voxels)}
+                if trace is not None:
+                    trace.count("hollowed_voxels", len(solid) - len(voxels))
+            with trace_span(trace, "export"), atomic_open(filename) as f:
+                write_vox(f, voxels, palette, swap_yz=swap_yz)
+                if trace is not None:
+                    trace.count("bytes_written", f.tell())
+            if meshes:
+                with trace_span(trace, "mesh"):
+                    mesh = export_meshes(filename, solid, palette, swap_yz, meshes)
+                if trace is not None:
+                    for name in ("naive_triangles", "culled_triangles", "triangles"):
+                        trace.count(name, mesh[name])
+            if lods:
+                with trace_span(trace, "lod"):
+                    levels = export_lods(filename, solid, palette, swap_yz, lods, lod_threshold, shell)
+                if trace is not None:
+                    for level in levels:
+                        trace.count(f"lod{level['factor']}_voxels", level["voxels"])
+            if cache is not None:
+                cache.store(key, filename)
+    except BaseException:
+        sink.release(filename)
+        raise
+
+    entry = {
+        "file": os.path.basename(filename), "generator": generator, "seed": params.get("seed"),
+        "palette": palette_name, "params": params, "cached": cached, "bytes": os.path.getsize(filename),
+        "seconds": round(time.perf_counter() - start, 4), "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    if hollowed is not None:
+        entry["hollow"] = hollowed
+    if mesh is not None:
+        entry["mesh"] = dict(mesh, formats=list(meshes))
+    if levels is not None:
+        entry["lod"] = {"threshold": lod_threshold, "levels": levels}
+    sink.record(entry)
+    return filename
+
+# === Forest scenes ===
+# MagicaVoxel packs a transform's rotation matrix into one byte: the column of
+# row 0's and row 1's non-zero entry in bits 0-1 and 2-3, row signs in bits 4-6.
+# These are 0, 90, 180 and 270 degrees about z.
+Z_ROTATIONS = (4, 17, 52, 33)
+
+def poisson_disk(width, depth, spacing, rng, attempts=30):
+    """Bridson's Poisson-disk sampling: (n, 2) points in [0, width) x [0, depth)
+    with no two closer than `spacing`. Each step tests all `attempts`
+    candidates around an active point against their 5x5 grid neighborhoods at once."""
+    cell = spacing / math.sqrt(2)
+    gw, gd = int(width // cell) + 1, int(depth // cell) + 1
+    grid = np.full((gw + 4, gd + 4), -1, dtype=np.int64)  # padded by 2 cells per side
+    points = np.empty((gw * gd, 2))
+    points[0] = rng.uniform((0, 0), (width, depth))
+    grid[tuple((points[0] // cell).astype(int) + 2)] = 0
+    n, active = 1, [0]
+    window = np.stack(np.meshgrid(np.arange(-2, 3), np.arange(-2, 3), indexing="ij"), axis=-1).reshape(-1, 2)
+    while active:
+        k = int(rng.integers(len(active)))
+        radius = spacing * np.sqrt(rng.uniform(1, 4, attempts))
+        angle = rng.uniform(0, 2 * math.pi, attempts)
+        candidates = points[active[k]] + np.stack([np.cos(angle), np.sin(angle)], axis=1) * radius[:, None]
+        inside = (candidates >= 0).all(axis=1) & (candidates[:, 0] < width) & (candidates[:, 1] < depth)
+        candidates = candidates[inside]
+        cells = (candidates // cell).astype(int) + 2
+        near = grid[cells[:, None, 0] + window[:, 0], cells[:, None, 1] + window[:, 1]]
+        gap = np.linalg.norm(points[np.maximum(near, 0)] - candidates[:, None], axis=2)
+        ok = np.flatnonzero(((near < 0) | (gap >= spacing)).all(axis=1))
+        if len(ok):
+            points[n] = candidates[ok[0]]
+            grid[tuple(cells[ok[0]])] = n
+            active.append(n)
+            n += 1
+        else:
+            active[k] = active[-1]
+            active.pop()
+    return points[:n]
+
+def parse_species(spec):
+    """GENERATOR[:PALETTE][=WEIGHT] -> (generator, palette_name, weight)"""
+    spec, _, weight = spec.partition("=")
+    generator, _, palette = spec.partition(":")
+    if generator not in OUTPUTS:
+        raise ValueError(f"Unknown generator {generator!r} in species {spec!r}")
+    _, _, palette_dir, default_palette = GENERATORS[generator]
+    return generator, os.path.join(palette_dir, palette or default_palette), float(weight or 1)
+
+def build_variant(generator, params, palette_name):
+    """One forest variant as export-space (xyz, colors, size, palette)"""
+    build, swap_yz, _, _ = OUTPUTS[generator]
+    voxels, palette = build(params, palette_name)
+    shell = int(clamp(params.get("hollow", 0), 0, MAX_HOLLOW))
+    if shell:
+        voxels = voxels.hollow(shell)
+    return (*export_space(voxels, swap_yz), palette)
+
+def merge_palettes(variants):
+    """One shared palette for variants drawn with different palettes.
+
+    Returns (palette, colors) with every variant's colors remapped to the
+    shared palette; identical RGBA entries are merged.
+    """
+    shared, index, remapped = [], {}, []
+    for _, colors, _, palette in variants:
+        lookup = np.zeros(256, dtype=np.uint8)
+        for c in np.unique(colors).tolist():
+            rgba = tuple(palette[c - 1])
+            if rgba not in index:
+                if len(shared) == 255:
+                    raise ValueError("Forest species use more than 255 distinct colors")
+                shared.append(rgba)
+                index[rgba] = len(shared)
+            lookup[c] = index[rgba]
+        remapped.append(lookup[colors])
+    return shared + [(0, 0, 0, 255)] * (256 - len(shared)), remapped
+
+def generate_forest(species, variants=6, scene=(512, 512), spacing=40.0, density=1.0, seed=1,
+                    size_jitter=0.2, overrides=(), workers=None, filename=None):
+    """Generate a forest .vox of instanced trees; returns (filename, summary).
+
+    Trees are placed by Poisson-disk sampling with at least `spacing` voxels
+    between trunks, `density` trees per 100x100 voxels at most. Only
+    `variants` unique trees are built, in parallel and split across `species`
+    by weight. Every placed tree is a transform with a random z rotation over
+    one of those shared models, so file size and generation time follow the
+    number of variants, not the number of trees.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    start = time.perf_counter()
+    rng = np.random.default_rng(int(seed))
+    species = [parse_species(s) for s in species]
+    weights = np.array([w for _, _, w in species]) / sum(w for _, _, w in species)
+    # Largest-remainder split of the variants, with at least one per species
+    share = weights * variants
+    per_species = np.floor(share).astype(int)
+    per_species[np.argsort(per_species - share)[:variants - per_species.sum()]] += 1
+    per_species = np.maximum(per_species, 1)
+
+    # Checked here so bad input fails before any worker starts
+    unknown = {k for k, _ in overrides} - {k for generator, _, _ in species for k in GENERATORS[generator][1]}
+    if unknown:
+        raise ValueError(f"Unknown forest parameter(s): {', '.join(sorted(unknown))}")
+    bases = []
+    for generator, palette_name, _ in species:
+        defaults = GENERATORS[generator][1]
+        bases.append(build_params(generator, overrides=[(k, v) for k, v in overrides if k in defaults]))
+        PALETTES.get(palette_name)
+
+    jobs = []
+    for (generator, palette_name, _), base, count in zip(species, bases, per_species):
+        for _ in range(count):
+            params = dict(base)
+            params["seed"] = int(rng.integers(1, 10000))
+            params["size"] = params["size"] * rng.uniform(1 - size_jitter, 1 + size_jitter)
+            jobs.append((generator, params, palette_name))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        built = list(pool.map(build_variant, *zip(*jobs)))
+    palette, colors = merge_palettes(built)
+
+    models, variant_models = [], []
+    for (xyz, _, size, _), remapped in zip(built, colors):
+        tiles = vox_models(xyz, remapped, size)
+        variant_models.append([(len(models) + i, offset) for i, offset in enumerate(model_offsets(tiles, size))])
+        models.extend(tiles)
+    species_of = np.repeat(np.arange(len(species)), per_species)
+
+    width, depth = scene
+    points = poisson_disk(width, depth, spacing, rng)
+    limit = int(density * width * depth / 10000)
+    if len(points) > limit:
+        points = points[rng.choice(len(points), limit, replace=False)]
+    picks = rng.choice(len(species), len(points), p=weights)
+
+    node, children, chunks = 2, [], []
+    for (x, y), pick in zip(points, picks):
+        variant = int(rng.choice(np.flatnonzero(species_of == pick)))
+        tiles = variant_models[variant]
+        kids = [node + 2 + 2 * i for i in range(len(tiles))]
+        children.append(node)
+        chunks.append(vox_transform(node, node + 1, (x - width // 2, y - depth // 2, 0),
+                                    Z_ROTATIONS[int(rng.integers(4))]))
+        chunks.append(vox_group(node + 1, kids))
+        for kid, (model, offset) in zip(kids, tiles):
+            chunks.append(vox_transform(kid, kid + 1, offset) + vox_shape(kid + 1, model))
+        node = kids[-1] + 2 if kids else node + 2
+    scene_graph = vox_transform(0, 1, layer=-1) + vox_group(1, children) + b"".join(chunks)
+
+    if filename is None:
+        sink = OutputSink(os.path.join("output", "forest"), "forest")
+        filename = sink.reserve()
+    else:
+        sink = OutputSink(os.path.dirname(filename))
+        os.makedirs(sink.directory, exist_ok=True)
+    try:
+        with atomic_open(filename) as f:
+            write_vox_models(f, models, palette, scene_graph)
+    except BaseException:
+        sink.release(filename)
+        raise
+    summary = {
+        "file": os.path.basename(filename), "generator": "forest", "seed": seed,
+        "species": [f"{g}:{os.path.basename(p)}={w:g}" for g, p, w in species],
+        "variants": [{"generator": g, "params": p, "palette": n} for g, p, n in jobs],
+        "trees": len(points), "models": len(models), "scene": f"{width}x{depth}",
+        "bytes": os.path.getsize(filename), "seconds": round(time.perf_counter() - start, 4),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+    sink.record(summary)
+    return filename, summary
+
+# === Growth sequences ===
+def segment_tips(segments):
+    """Ends and midpoints of `segments`, the leaf anchors of a tree's outermost level"""
+    return np.stack([segments["end"], (segments["start"] + segments["end"]) / 2], axis=1).reshape(-1, 3)
+
+def treegen_tips(segments, level):
+    """(lasting, fresh) leaf anchors added at `level`: treegen leaves only sit on
+    the newest branches, so every level's leaves are fresh"""
+    return np.empty((0, 3)), segment_tips(segments[segments["level"] == level])
+
+def pinegen_tips(segments, level):
+    """(lasting, fresh) leaf anchors added at `level`: the steps of twigs sprouted
+    at this level keep their leaves, the trunk top's move up with it"""
+    twigs = segments[(segments["r0"] == 0) & (segments["level"] == level)]
+    return twigs["end"], segment_tips(segments[(segments["r0"] > 0) & (segments["level"] == level)])
+
+GROWTH = {
+    "treegen": (treegen_skeleton, treegen_tips, "tree", False),
+    "pinegen": (pinegen_skeleton, pinegen_tips, "pine", True),
+}
+
+def growth_frames(generator, params, palette_name, progress=None, trace=None):
+    """A tree at every level of its growth; returns (levels, frames, palette).
+
+    The skeleton is grown once with the tree's own rng mode, so the last frame
+    has exactly the branches of the full tree. Each level rasterizes only its
+    new segments onto the wood of the level before, which keeps earlier
+    branches and their colors, then regrows leaves at that level's tips with
+    the batched engines and a NumPy rng seeded per level. Leaves on parts that
+    stop growing, like pine twigs, are grown once and kept.
+    """
+    skeleton, tips, kind, swap_yz = GROWTH[generator]
+    report = progress or no_progress
+    palette = PALETTES.get(palette_name, kind)
+    width, depth, height = world_shape(params)
+    shape = (width, height, depth) if swap_yz else (width, depth, height)
+
+    report("skeleton")
+    with trace_span(trace, "skeleton"):
+        segments, _ = skeleton(params, make_rng(params, int(params["seed"])))
+    levels = np.unique(segments["level"]).tolist()
+
+    def grow_leaves(voxels, anchors, rng):
+        if len(anchors) == 0:
+            return
+        if generator == "treegen":
+            walked = random_walks(anchors, int(5 * params["leaves"]), int(50 * params["leaves"]),
+                                  params["gravity"], rng)
+            leaf_vox = linear_indices(walked, shape)
+        else:
+            leaf_vox = pinegen_leaves(params, anchors, shape, rng, trace)
+        paint_cycled(voxels, color_order(leaf_vox, rng, True), palette.leaves, overwrite=False)
+
+    wood, foliage = SparseVoxels(shape), SparseVoxels(shape)
+    frames = []
+    for n, level in enumerate(levels):
+        report("leaves", n / len(levels))
+        rng = np.random.default_rng((int(params["seed"]), level))
+        with trace_span(trace, "trunk"):
+            grown = rasterize_segments(segments[segments["level"] == level], shape, trace)
+            paint_cycled(wood, color_order(grown, rng, True), palette.trunk, overwrite=False)
+        with trace_span(trace, "leaves"):
+            lasting, fresh = tips(segments, level)
+            grow_leaves(foliage, lasting, rng)
+            frame = wood.copy()
+            frame.fill(foliage.keys, foliage.values)
+            grow_leaves(frame, fresh, rng)
+        frames.append(frame)
+    return levels, frames, palette.colors
+
+def save_growth(generator, params, palette_name, filename, series=False, progress=None, trace=None):
+    """Write a tree's growth frames as one animated .vox, or with `series` as
+    <stem>_<level>.vox files; returns the filenames written"""
+    start = time.perf_counter()
+    _, _, _, swap_yz = GROWTH[generator]
+    levels, frames, palette = growth_frames(generator, params, palette_name, progress, trace)
+    shell = int(clamp(params.get("hollow", 0), 0, MAX_HOLLOW))
+    if shell:
+        frames = [frame.hollow(shell) for frame in frames]
+    (progress or no_progress)("export")
+    directory = os.path.dirname(filename)
+    os.makedirs(directory or ".", exist_ok=True)
+    with trace_span(trace, "export"):
+        if series:
+            stem = os.path.splitext(filename)[0]
+            width = len(str(levels[-1]))
+            written = [f"{stem}_{level:0{width}d}.vox" for level in levels]
+            for name, frame in zip(written, frames):
+                with atomic_open(name) as f:
+                    write_vox(f, frame, palette, swap_yz=swap_yz)
+        else:
+            written = [filename]
+            with atomic_open(filename) as f:
+                write_vox_frames(f, frames, palette, swap_yz=swap_yz)
+    OutputSink(directory).record({
+        "file": os.path.basename(written[0]), "frames": [os.path.basename(name) for name in written],
+        "generator": generator, "seed": params.get("seed"), "palette": palette_name, "params": params,
+        "levels": levels, "voxels": [len(frame) for frame in frames],
+        "bytes": sum(os.path.getsize(name) for name in written),
+        "seconds": round(time.perf_counter() - start, 4), "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    })
+    return written
+
+# === Seed explorer ===
+EXPLORE_THUMB = 96
+EXPLORE_LABEL = 16
+EXPLORE_TEXT = (60, 60, 60)
+
+def explore_tile(generator, params, palette_name, thumb=EXPLORE_THUMB):
+    """Front and top thumbnails of one tree side by side, as a (thumb, 2 * thumb) RGB array.
+
+    Each view is cropped to the tree and scaled to fit, so shapes compare
+    well even though sizes don't. Nothing is exported.
+    """
+    from PIL import Image
+    build, swap_yz, _, _ = OUTPUTS[generator]
+    voxels, palette = build(params, palette_name)
+    tile = Image.new("RGB", (2 * thumb, thumb), PREVIEW_BACKGROUND)
+    for i, view in enumerate(("front", "top")):
+        image = render_projection(voxels, palette, view, swap_yz)
+        rows, cols = np.nonzero((np.asarray(image) != PREVIEW_BACKGROUND).any(axis=2))
+        if len(rows):
+            image = image.crop((cols.min(), rows.min(), cols.max() + 1, rows.max() + 1))
+        fit = (thumb - 4) / max(image.size)
+        image = image.resize((max(1, round(image.width * fit)), max(1, round(image.height * fit))),
+                             Image.BOX if fit < 1 else Image.NEAREST)
+        tile.paste(image, (i * thumb + (thumb - image.width) // 2, (thumb - image.height) // 2))
+    return np.asarray(tile)
+
+def contact_sheet(tiles, columns):
+    """Lay out (seed, tile array or None) pairs row by row under seed labels.
+
+    Returns (sheet, cell) where `cell` is the (width, height) of one grid cell;
+    the tile at column c, row r belongs to tiles[r * columns + c]. Failed
+    seeds (None) get an empty cell with their label.
+    """
+    from PIL import Image, ImageDraw
+    thumb = next((tile.shape[0] for _, tile in tiles if tile is not None), EXPLORE_THUMB)
+    cell = (2 * thumb + 4, thumb + EXPLORE_LABEL + 4)
+    rows = -(-len(tiles) // columns)
+    sheet = Image.new("RGB", (columns * cell[0], rows * cell[1]), (255, 255, 255))
+    draw = ImageDraw.Draw(sheet)
+    for i, (seed, tile) in enumerate(tiles):
+        x, y = (i % columns) * cell[0] + 2, (i // columns) * cell[1] + 2
+        if tile is not None:
+            sheet.paste(Image.fromarray(tile), (x, y))
+        draw.text((x + 2, y + thumb + 2), f"seed {seed}" if tile is not None else f"seed {seed} failed",
+                  fill=EXPLORE_TEXT)
+    return sheet, cell
+
+def explore_seeds(generator, params, palette_name, seeds, workers=None, thumb=EXPLORE_THUMB, columns=None,
+                  progress=None, mp_context=None):
+    """Render `seeds` of one parameter set into a contact sheet across worker processes.
+
+    Returns (sheet, cell, failures) as for contact_sheet, with `failures` a
+    {seed: exception} dict. `progress(done, total)` is called as tiles come
+    in. Pass a spawn `mp_context` from a process running other threads, such
+    as the GUI, where forking could copy a held lock.
+    """
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    # Decoded before the pool starts, so forked workers inherit it
+    PALETTES.get(palette_name, GENERATORS[generator][2])
+    tiles, failures = {}, {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        jobs = {pool.submit(explore_tile, generator, dict(params, seed=seed), palette_name, thumb): seed
+                for seed in seeds}
+        for done, job in enumerate(as_completed(jobs), 1):
+            seed = jobs[job]
+            try:
+                tiles[seed] = job.result()
+            except Exception as e:
+                tiles[seed], failures[seed] = None, e
+            if progress is not None:
+                progress(done, len(jobs))
+    columns = columns or max(1, round(math.sqrt(len(seeds) / 2)))
+    sheet, cell = contact_sheet([(seed, tiles[seed]) for seed in seeds], columns)
+    return sheet, cell, failures
+
+# === Background generation ===
+class GenerationWorker:
+    """Runs queued generation jobs one at a time on a background thread.
+
+    The thread never touches Tk; it posts ("progress" | "done" | "error" |
+    "cancelled", job, value) events that the GUI drains from `root.after`.
+    """
+
+    def __init__(self, cache=None, stages=None):
+        self.cache = cache
+        self.stages = stages
+        self.jobs = queue.Queue()
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.current = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, label, generate, params, palette_name, use_cache=True, trace=None, meshes=(), lods=(),
+               on_done=None, on_error=None, on_cancel=None):
+        self.jobs.put({"label": label, "generate": generate, "params": params, "palette": palette_name,
+                       "cache": self.cache if use_cache else None, "trace": trace, "meshes": meshes, "lods": lods,
+                       "on_done": on_done, "on_error": on_error, "on_cancel": on_cancel})
+
+    @property
+    def pending(self):
+        return self.jobs.qsize() + (self.current is not None)
+
+    def cancel(self):
+        """Abort the running job and drop everything still queued"""
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            self.events.put(("cancelled", job, None))
+        if self.current is not None:
+            self.cancelled.set()
+
+    def drain(self):
+        while True:
+            try:
+                yield self.events.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            self.current = job
+            self.cancelled.clear()
+
+            def check():
+                if self.cancelled.is_set():
+                    raise GenerationCancelled()
+
+            def progress(stage, fraction=0.0):
+                check()
+                self.events.put(("progress", job, overall_progress(stage, fraction)))
+
+            try:
+                with cancellable(check):
+                    filename = job["generate"](job["params"], job["palette"], progress=progress,
+                                               cache=job["cache"], trace=job["trace"], meshes=job["meshes"],
+                                               lods=job["lods"], stages=self.stages)
+            except GenerationCancelled:
+                self.events.put(("cancelled", job, None))
+            except Exception as e:
+                self.events.put(("error", job, e))
+            else:
+                self.events.put(("done", job, filename))
+            finally:
+                self.current = None
+
+# === HEADLESS CLI ===
+GENERATORS = {
+    "treegen": (generate_treegen_tree, TREEGEN_DEFAULTS, "tree", "tree_default.png"),
+    "pinegen": (generate_pinegen_tree, PINEGEN_DEFAULTS, "pine", "pine_default.png"),
+}
+
+def parse_seeds(spec):
+    """Parse a seed list such as "1-100" or "1,5,10-20" """
+    seeds = []
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            seeds.extend(range(int(lo), int(hi) + 1))
+        elif part:
+            seeds.append(int(part))
+    return seeds
+
+def seed_list(text):
+    """argparse type for --seeds: parse_seeds with a usage error instead of a traceback"""
+    import argparse
+    try:
+        return parse_seeds(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected seeds such as 1-100 or 1,5,10-20, got {text!r}") from None
+
+def parse_override(text):
+    import argparse
+    key, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got {text!r}")
+    try:
+        return key.strip(), json.loads(value)
+    except ValueError:
+        return key.strip(), value
+
+def coerce_param(key, value, default):
+    """`value` as the type of `default`, so "5" and 5 build (and cache) the same tree"""
+    kind = type(default)
+    if kind is str:
+        if isinstance(value, str):
+            return value
+    else:
+        if isinstance(value, str):
+            try:
+                value = int(value) if kind is int else float(value)
+            except ValueError:
+                pass
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+            if kind is float or value == int(value):
+                return kind(value)
+    expected = {str: "a string", int: "an integer", float: "a number"}[kind]
+    raise ValueError(f"Parameter {key} must be {expected}, got {value!r}")
+
+def build_params(generator, params_file=None, overrides=()):
+    params = dict(GENERATORS[generator][1])
+    if params_file:
+        with open(params_file, "r") as f:
+            params.update(json.load(f))
+    params.update(overrides)
+    unknown = set(params) - set(GENERATORS[generator][1])
+    if unknown:
+        raise ValueError(f"Unknown {generator} parameter(s): {', '.join(sorted(unknown))}")
+    params = {key: coerce_param(key, value, GENERATORS[generator][1][key]) for key, value in params.items()}
+    world_shape(params)
+    make_rng(params, 0)
+    unique_colors(params)
+    return params
+
+def _expire(signum, frame):
+    raise TimeoutError("generation timed out")
+
+def run_batch_job(generator, params, palette_name, filename, timeout=None, cache=None, profile=None, meshes=(),
+                  lods=(), lod_threshold=LOD_THRESHOLD):
+    """Generate one tree in a worker process; returns (elapsed seconds, cache hit, trace).
+
+    The trace is the job's GenerationTrace as a dict, for the batch summary and
+    `profile` "trace"; "cprofile" also dumps cProfile stats next to
+    `filename` and names the dump in the trace.
+    """
+    import cProfile
+    alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    if alarm:
+        signal.signal(signal.SIGALRM, _expire)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        trace = GenerationTrace()
+        profiler = cProfile.Profile() if profile == "cprofile" else None
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            GENERATORS[generator][0](params, palette_name, filename=filename, cache=cache, trace=trace,
+                                     meshes=meshes, lods=lods, lod_threshold=lod_threshold)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        elapsed = time.perf_counter() - start
+        report = trace.as_dict()
+        if profiler is not None:
+            report["cprofile"] = filename + ".prof"
+            profiler.dump_stats(report["cprofile"])
+        return elapsed, bool(cache and cache.hits), report
+    finally:
+        if alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+def run_batch(args):
+    import pstats
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    generate, _, palette_dir, default_palette = GENERATORS[args.generator]
+    palette_name = os.path.join(palette_dir, args.palette or default_palette)
+    try:
+        base = build_params(args.generator, args.params, args.overrides)
+        # Decoded before the pool starts, so forked workers inherit it
+        PALETTES.get(palette_name, palette_dir)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    output_dir = args.output_dir or os.path.join("output", palette_dir)
+    seeds = args.seeds
+    cache = None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_size * (1 << 20)))
+    profile = None
+    if args.profile:
+        profile = "cprofile" if args.profile.endswith((".prof", ".pstats")) else "trace"
+    meshes = tuple(dict.fromkeys(args.mesh or ()))
+    lods = tuple(sorted(set(args.lod or ())))
+    if any(factor < 2 for factor in lods) or not 0 <= args.lod_threshold < 1:
+        print("error: --lod factors must be at least 2 and --lod-threshold in [0, 1)", file=sys.stderr)
+        return 2
+    traces = []
+
+    failures = hits = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        jobs = {}
+        for seed in seeds:
+            filename = os.path.join(output_dir, f"{args.generator}_seed{seed}.vox")
+            job = pool.submit(run_batch_job, args.generator, dict(base, seed=seed),
+                              palette_name, filename, args.timeout, cache, profile, meshes,
+                              lods, args.lod_threshold)
+            jobs[job] = (seed, filename)
+        for job in as_completed(jobs):
+            seed, filename = jobs[job]
+            try:
+                elapsed, hit, trace = job.result()
+            except Exception as e:
+                failures += 1
+                print(f"seed {seed}: FAILED ({type(e).__name__}: {e})", file=sys.stderr)
+            else:
+                hits += hit
+                traces.append(dict(trace, seed=seed, filename=filename, seconds=elapsed))
+                if args.verbose:
+                    print(f"seed {seed}: {filename} ({elapsed:.2f}s{', cached' if hit else ''})")
+    elapsed = time.perf_counter() - start
+
+    done = len(seeds) - failures
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"{done}/{len(seeds)} {args.generator} trees in {elapsed:.2f}s "
+          f"({rate:.2f} trees/sec), {failures} failed")
+    if cache is not None:
+        stats = cache.stats()
+        print(f"cache: {hits} hits, {done - hits} misses, {stats['entries']} entries "
+              f"({stats['bytes'] / (1 << 20):.1f} MiB) in {cache.directory}")
+    hollowed = sum(trace["counters"].get("hollowed_voxels", 0) for trace in traces)
+    if hollowed:
+        kept = sum(trace["counters"].get("voxels", 0) for trace in traces) - hollowed
+        print(f"hollowing removed {hollowed} interior voxels, {100 * hollowed / (hollowed + kept):.0f}% "
+              f"of the total; {kept} written")
+    if meshes and traces:
+        totals = {name: sum(trace["counters"].get(name, 0) for trace in traces)
+                  for name in ("naive_triangles", "culled_triangles", "triangles")}
+        print(f"meshes ({', '.join(meshes)}): {totals['triangles']} triangles, "
+              f"{totals['triangles'] / len(traces):.0f} per tree; culling left {totals['culled_triangles']} "
+              f"of {totals['naive_triangles']} cube triangles, greedy merging kept "
+              f"{100 * totals['triangles'] / max(totals['culled_triangles'], 1):.0f}% of those")
+    if lods and traces:
+        print("lods: " + ", ".join(
+            f"{factor}x {sum(trace['counters'].get(f'lod{factor}_voxels', 0) for trace in traces)} voxels"
+            for factor in lods))
+    if profile == "cprofile" and traces:
+        dumps = [trace.pop("cprofile") for trace in traces]
+        merged = pstats.Stats(dumps[0])
+        for dump in dumps[1:]:
+            merged.add(dump)
+        merged.dump_stats(args.profile)
+        for dump in dumps:
+            os.remove(dump)
+        print(f"cProfile stats for {len(dumps)} trees written to {args.profile}")
+    elif profile == "trace":
+        traces.sort(key=lambda trace: trace["seed"])
+        with open(args.profile, "w") as f:
+            json.dump({"generator": args.generator, "palette": palette_name, "params": base,
+                       "runs": traces}, f, indent=1)
+        print(f"Trace for {len(traces)} trees written to {args.profile}")
+    return 1 if failures else 0
+
+# === Generation server ===
+SERVE_PORT = 8765
+SERVE_QUEUE = 64
+SERVE_MAX_REQUEST = 1 << 20
+SERVE_LATENCY_WINDOW = 1000
+
+def warm_worker():
+    """Pool initializer: decode every palette once, so no request pays for it"""
+    for kind in PALETTE_KINDS:
+        try:
+            names = PALETTES.names(kind)
+        except OSError:
+            continue
+        for name in names:
+            try:
+                PALETTES.get(os.path.join(kind, name), kind)
+            except (OSError, ValueError):
+                pass
+
+class GenerationServer:
+    """A warm process pool behind a small JSON API for build systems.
+
+    POST /generate runs one tree; GET /health and GET /metrics report on the
+    server. Workers start once, with every palette decoded, and are replaced
+    as a whole if one dies. Build-system traffic is nearly all distinct seeds,
+    so they keep no stage caches. At most `workers` + `queue_size` requests
+    are admitted at a time; the rest are turned away with 503 and
+    Retry-After, so callers back off instead of piling up.
+    """
+
+    def __init__(self, workers=None, queue_size=SERVE_QUEUE, cache=None, timeout=None):
+        import tempfile
+        self.workers = workers or os.cpu_count()
+        self.limit = self.workers + queue_size
+        self.slots = threading.BoundedSemaphore(self.limit)
+        self.cache = cache
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.restart_lock = threading.Lock()
+        self.started = time.time()
+        self.in_flight = 0
+        self.broken = False
+        self.stats = collections.Counter()
+        self.latency = collections.deque(maxlen=SERVE_LATENCY_WINDOW)
+        self.pool = self.start_pool()
+        self.scratch = tempfile.mkdtemp(prefix="treegen-serve-")
+
+    def start_pool(self):
+        """A process pool with every worker started and its palettes decoded"""
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Workers come from a single-threaded fork server, so a pool started
+        # while requests are running can't inherit a lock some request holds
+        context = (multiprocessing.get_context("forkserver")
+                   if "forkserver" in multiprocessing.get_all_start_methods() else None)
+        pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=warm_worker)
+        # Each job submitted while none has finished starts another worker
+        list(pool.map(int, range(self.workers)))
+        return pool
+
+    def restart_pool(self, broken):
+        """Replace `broken`, unless a request that hit it first already did"""
+        with self.restart_lock:
+            if self.pool is not broken:
+                return
+            try:
+                pool = self.start_pool()
+            except Exception:
+                self.broken = True
+                raise
+            with self.lock:
+                self.pool, self.broken = pool, False
+                self.stats["pool_restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def parse(self, request):
+        """Validate a /generate request; returns the job as a dict or raises ValueError"""
+        if not isinstance(request, dict):
+            raise ValueError("expected a JSON object")
+        generator = request.get("generator")
+        if generator not in GENERATORS:
+            raise ValueError(f"generator must be one of {', '.join(sorted(GENERATORS))}")
+        _, _, palette_dir, default_palette = GENERATORS[generator]
+        params = build_params(generator, overrides=dict(request.get("params") or {}))
+        palette_name = os.path.join(palette_dir, request.get("palette") or default_palette)
+        PALETTES.get(palette_name, palette_dir)
+        mode = request.get("return", "path")
+        meshes = tuple(dict.fromkeys(request.get("mesh") or ()))
+        lods = tuple(sorted(set(int(factor) for factor in request.get("lod") or ())))
+        if mode not in ("path", "vox"):
+            raise ValueError('"return" must be "path" or "vox"')
+        if set(meshes) - set(MESH_FORMATS) or any(factor < 2 for factor in lods):
+            raise ValueError(f'"mesh" takes {", ".join(MESH_FORMATS)} and "lod" factors of at least 2')
+        if mode == "vox" and (meshes or lods or request.get("output")):
+            raise ValueError('"mesh", "lod" and "output" need "return": "path"')
+        timeout = request.get("timeout", self.timeout)
+        return {"generator": generator, "params": params, "palette": palette_name, "mode": mode,
+                "output": request.get("output"), "meshes": meshes, "lods": lods,
+                "timeout": None if timeout is None else float(timeout)}
+
+    def generate(self, request):
+        """Serve one /generate request; returns (HTTP status, headers, JSON dict or .vox bytes)"""
+        from concurrent.futures.process import BrokenProcessPool
+        start = time.perf_counter()
+        with self.lock:
+            self.stats["requests"] += 1
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.stats["rejected"] += 1
+            return 503, {"Retry-After": "1"}, {"error": f"server busy: {self.limit} requests in flight"}
+        try:
+            with self.lock:
+                self.in_flight += 1
+            try:
+                job = self.parse(request)
+            except (OSError, ValueError, TypeError) as e:
+                with self.lock:
+                    self.stats["invalid"] += 1
+                return 400, {}, {"error": str(e)}
+
+            generator = job["generator"]
+            _, _, output_dir, prefix = OUTPUTS[generator]
+            if job["mode"] == "vox":
+                filename = os.path.join(self.scratch, f"{threading.get_ident()}_{time.monotonic_ns()}.vox")
+            elif job["output"]:
+                filename = job["output"]
+                os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+            else:
+                filename = OutputSink(output_dir, prefix).reserve()
+            pool = self.pool
+            try:
+                elapsed, hit, trace = pool.submit(
+                    run_batch_job, generator, job["params"], job["palette"], filename, job["timeout"],
+                    self.cache, None, job["meshes"], job["lods"]).result()
+            except Exception as e:
+                OutputSink(os.path.dirname(filename)).release(filename)
+                with self.lock:
+                    self.stats["failed"] += 1
+                error = {"error": f"{type(e).__name__}: {e}"}
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died, maybe killed for memory; the job may well succeed again
+                    try:
+                        self.restart_pool(pool)
+                    except Exception as restart:
+                        error["restart"] = f"{type(restart).__name__}: {restart}"
+                    return 503, {"Retry-After": "1"}, error
+                return 504 if isinstance(e, TimeoutError) else 500, {}, error
+
+            total = time.perf_counter() - start
+            timing = {"queued": round(max(total - elapsed, 0.0), 4), "generate": round(elapsed, 4),
+                      "total": round(total, 4)}
+            with self.lock:
+                self.stats["completed"] += 1
+                self.stats[f"{generator}_completed"] += 1
+                self.stats["cache_hits"] += hit
+                self.stats["generate_seconds"] += elapsed
+                self.latency.append(total)
+            if job["mode"] == "vox":
+                with open(filename, "rb") as f:
+                    body = f.read()
+                os.remove(filename)
+                return 200, {"X-Treegen-Timing": json.dumps(timing), "X-Treegen-Cached": str(hit).lower(),
+                             "X-Treegen-Seed": str(job["params"]["seed"])}, body
+            return 200, {}, {"generator": generator, "seed": job["params"]["seed"], "palette": job["palette"],
+                             "file": os.path.abspath(filename), "bytes": os.path.getsize(filename), "cached": hit,
+                             "timing": timing, "trace": trace}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+            self.slots.release()
+
+    def health(self):
+        with self.lock:
+            return {"status": "broken" if self.broken else "ok", "workers": self.workers,
+                    "in_flight": self.in_flight, "limit": self.limit,
+                    "uptime": round(time.time() - self.started, 1)}
+
+    def metrics(self):
+        with self.lock:
+            latency = sorted(self.latency)
+            stats = dict(self.stats)
+        report = dict(self.health(), requests=stats)
+        if latency:
+            report["latency"] = {"window": len(latency), "p50": round(latency[len(latency) // 2], 4),
+                                 "p95": round(latency[int(len(latency) * 0.95)], 4), "max": round(latency[-1], 4)}
+        if self.cache is not None:
+            # Hit counts live in the workers; "requests" has them
+            stats = self.cache.stats()
+            report["cache"] = {"entries": stats["entries"], "bytes": stats["bytes"]}
+        return report
+
+    def http_server(self, host="127.0.0.1", port=SERVE_PORT, socket_path=None, verbose=False):
+        """A threading HTTP server for this pool on localhost or a Unix socket"""
+        import http.server
+        import socketserver
+        app = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def reply(self, status, headers, body):
+                if isinstance(body, dict):
+                    body = json.dumps(body).encode()
+                    headers = dict(headers, **{"Content-Type": "application/json"})
+                else:
+                    headers = dict(headers, **{"Content-Type": "application/octet-stream"})
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/health":
+                    health = app.health()
+                    self.reply(200 if health["status"] == "ok" else 503, {}, health)
+                elif self.path == "/metrics":
+                    self.reply(200, {}, app.metrics())
+                else:
+                    self.reply(404, {}, {"error": f"no such endpoint {self.path}"})
+
+            def do_POST(self):
+                if self.path != "/generate":
+                    self.reply(404, {}, {"error": f"no such endpoint {self.path}"})
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                if length > SERVE_MAX_REQUEST:
+                    self.close_connection = True
+                    self.reply(413, {}, {"error": "request too large"})
+                    return
+                try:
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError as e:
+                    self.reply(400, {}, {"error": f"invalid JSON: {e}"})
+                    return
+                self.reply(*app.generate(request))
+
+            def log_message(self, format, *args):
+                if verbose:
+                    sys.stderr.write(f"{time.strftime('%H:%M:%S')} {format % args}\n")
+
+        if socket_path is None:
+            server = http.server.ThreadingHTTPServer((host, port), Handler)
+        else:
+            class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+                daemon_threads = True
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            server = UnixServer(socket_path, Handler)
+        return server
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+def run_serve(args):
+    start = time.perf_counter()
+    cache = None if args.no_cache else ResultCache(args.cache_dir, int(args.cache_size * (1 << 20)))
+    app = GenerationServer(args.workers, args.queue, cache, args.timeout)
+    try:
+        server = app.http_server(args.host, args.port, args.socket, args.verbose)
+    except OSError as e:
+        app.close()
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    where = f"unix:{args.socket}" if args.socket else f"http://{args.host}:{server.server_address[1]}"
+    print(f"serving on {where} with {app.workers} warm workers, {app.limit - app.workers} queue slots "
+          f"(ready in {time.perf_counter() - start:.2f}s)", flush=True)
+    # Workers are already forked, so they keep the default handler
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        app.close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+# === Benchmarks ===
+BENCH_PRESETS = {
+    "treegen": {
+        "sapling": {"size": 0.4, "trunksize": 0.5, "leaves": 0.6, "iterations": 8},
+        "default": {},
+        "max": {"size": 3.0, "leaves": 3.0},
+    },
+    "pinegen": {
+        "sapling": {"size": 0.4, "trunkheight": 0.5, "branchlength": 0.5, "leaves": 0.6},
+        "default": {},
+        "max": {"size": 3.0, "leaves": 2.0},
+    },
+}
+BENCH_GOLDEN = os.path.join("benchmarks", "golden.json")
+
+def bench_key(row):
+    return f"{row['generator']}/{row['preset']}/{os.path.basename(row['palette'])}/{row['rng']}/seed{row['seed']}"
+
+def run_bench_group(generator, preset, params, palettes):
+    """Build one preset with every palette in a fresh process; returns report rows.
+
+    Every palette is built cold, without stage memoization, so each row times
+    the whole pipeline and rows compare with each other.
+    """
+    build, swap_yz, _, _ = OUTPUTS[generator]
+    rows = []
+    for palette_name in palettes:
+        trace = GenerationTrace()
+        start = time.perf_counter()
+        voxels, palette = build(params, palette_name, trace=trace)
+        out = io.BytesIO()
+        with trace.span("export"):
+            write_vox(out, voxels, palette, swap_yz=swap_yz)
+        rows.append({
+            "generator": generator, "preset": preset, "palette": palette_name,
+            "seed": params["seed"], "rng": params["rng"], "params": params,
+            "seconds": time.perf_counter() - start, "stages": trace.spans, "counters": trace.counters,
+            "voxels": len(voxels), "bytes": out.tell(), "sha256": hashlib.sha256(out.getvalue()).hexdigest(),
+        })
+    peak = peak_rss_mb()
+    for row in rows:
+        row["peak_rss_mb"] = peak
+    return rows
+
+COLD_START_STEPS = {
+    "interpreter": "pass",
+    "import": "import treegen_core, json\n"
+              "print(json.dumps(sorted(m for m in ('tkinter', 'PIL') if m in sys.modules)))",
+    "generate": "import treegen_core as core\n"
+                "params = dict(core.TREEGEN_DEFAULTS, **core.BENCH_PRESETS['treegen']['sapling'])\n"
+                "core.generate_treegen_tree(params, os.path.join('tree', 'tree_default.png'),\n"
+                "                           filename=os.path.join(sys.argv[1], 'cold.vox'))",
+}
+
+def run_cold_start(runs):
+    """Median wall seconds of fresh interpreters that start, import this module,
+    and import it and write a sapling tree; plus the GUI modules the import loaded"""
+    import subprocess
+    import tempfile
+    prelude = f"import os, sys\nsys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r})\n"
+    seconds, loaded = {}, []
+    with tempfile.TemporaryDirectory() as scratch:
+        for step, code in COLD_START_STEPS.items():
+            times = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                out = subprocess.run([sys.executable, "-c", prelude + code, scratch],
+                                     capture_output=True, text=True, check=True).stdout
+                times.append(time.perf_counter() - start)
+            seconds[step] = float(np.median(times))
+            if step == "import":
+                loaded = json.loads(out)
+    return {"runs": runs, "seconds": seconds, "gui_modules_on_import": loaded}
+
+def run_bench(args):
+    import platform
+    from concurrent.futures import ProcessPoolExecutor
+    golden = {}
+    if os.path.exists(args.golden):
+        with open(args.golden) as f:
+            golden = json.load(f)
+
+    rows = []
+    for generator in args.generators or sorted(OUTPUTS):
+        _, defaults, palette_dir, _ = GENERATORS[generator]
+        palettes = [os.path.join(palette_dir, f) for f in PALETTES.names(palette_dir)]
+        for preset in args.presets or BENCH_PRESETS[generator]:
+            for seed in args.seeds:
+                params = dict(defaults, **BENCH_PRESETS[generator][preset], seed=seed, rng=args.rng)
+                # A fresh process per group keeps peak RSS and the kernel caches per case
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    group = pool.submit(run_bench_group, generator, preset, params, palettes).result()
+                for row in group:
+                    expected = golden.get(bench_key(row))
+                    row["golden"] = None if expected is None else expected == row["sha256"]
+                    mark = {None: "new", True: "ok", False: "CHANGED"}[row["golden"]]
+                    stages = " ".join(f"{k}={v:.2f}" for k, v in row["stages"].items())
+                    print(f"{bench_key(row)}: {row['seconds']:.2f}s {row['voxels']} voxels [{mark}] {stages}")
+                rows.extend(group)
+
+    cold = None
+    if args.cold_runs > 0 and not getattr(sys, "frozen", False):
+        cold = run_cold_start(args.cold_runs)
+        print("cold start: " + " ".join(f"{k}={v:.3f}s" for k, v in cold["seconds"].items())
+              + f" (median of {cold['runs']})")
+
+    report = {
+        "generator_version": GENERATOR_VERSION, "python": platform.python_version(),
+        "numpy": np.__version__, "platform": platform.platform(), "cases": rows, "cold_start": cold,
+    }
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Wrote {len(rows)} cases to {args.report}")
+
+    if args.update_golden:
+        golden.update((bench_key(row), row["sha256"]) for row in rows)
+        os.makedirs(os.path.dirname(args.golden) or ".", exist_ok=True)
+        with open(args.golden, "w") as f:
+            json.dump(golden, f, indent=1, sort_keys=True)
+        print(f"Updated {args.golden}")
+        return 0
+    changed = [bench_key(row) for row in rows if row["golden"] is False]
+    for key in changed:
+        print(f"golden mismatch: {key}", file=sys.stderr)
+    if cold and cold["gui_modules_on_import"]:
+        print(f"importing treegen_core loaded {', '.join(cold['gui_modules_on_import'])}", file=sys.stderr)
+        return 1
+    return 1 if changed else 0
+
+def run_growth(args):
+    _, _, palette_dir, default_palette = GENERATORS[args.generator]
+    palette_name = os.path.join(palette_dir, args.palette or default_palette)
+    filename = args.output or os.path.join("output", palette_dir, f"{args.generator}_seed{args.seed}_growth.vox")
+    trace = GenerationTrace()
+    try:
+        params = dict(build_params(args.generator, args.params, args.overrides), seed=args.seed)
+        written = save_growth(args.generator, params, palette_name, filename, args.series, trace=trace)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    seconds = sum(trace.spans.values())
+    target = f"{len(written)} files {written[0]} .. {written[-1]}" if args.series else written[0]
+    print(f"{args.generator} seed {args.seed}: {len(written) if args.series else 'animated'} "
+          f"growth frames in {seconds:.2f}s -> {target}")
+    print(trace.summary())
+    return 0
+
+def run_explore(args):
+    from PIL import PngImagePlugin
+    _, _, palette_dir, default_palette = GENERATORS[args.generator]
+    palette_name = os.path.join(palette_dir, args.palette or default_palette)
+    seeds = args.seeds
+    if not seeds or args.thumb < 8:
+        print("error: --seeds must name at least one seed and --thumb be at least 8", file=sys.stderr)
+        return 2
+    filename = args.output or os.path.join("output", palette_dir, f"{args.generator}_seeds_{seeds[0]}-{seeds[-1]}.png")
+    start = time.perf_counter()
+    try:
+        params = build_params(args.generator, args.params, args.overrides)
+        sheet, cell, failures = explore_seeds(args.generator, params, palette_name, seeds, args.workers,
+                                              args.thumb, args.columns)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    elapsed = time.perf_counter() - start
+    for seed, e in sorted(failures.items()):
+        print(f"seed {seed}: FAILED ({type(e).__name__}: {e})", file=sys.stderr)
+    # The layout travels with the sheet, so a tile position can be mapped back to its seed
+    info = PngImagePlugin.PngInfo()
+    info.add_text("treegen:explore", json.dumps({"generator": args.generator, "palette": palette_name,
+                                                 "params": params, "seeds": seeds, "cell": cell}))
+    os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+    with atomic_open(filename) as f:
+        sheet.save(f, "PNG", pnginfo=info)
+    print(f"{len(seeds) - len(failures)}/{len(seeds)} {args.generator} seeds in {elapsed:.2f}s "
+          f"({len(seeds) / elapsed:.1f} seeds/sec) -> {filename}")
+    return 1 if failures else 0
+
+def run_palettes(args):
+    unknown = set(args.kinds) - set(PALETTE_KINDS)
+    if unknown:
+        print(f"error: unknown palette kind(s): {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+    for kind in args.kinds or sorted(PALETTE_KINDS):
+        for name in PALETTES.names(kind):
+            try:
+                palette = PALETTES.get(os.path.join(kind, name), kind)
+            except ValueError as e:
+                print(f"{kind}/{name}: {e}", file=sys.stderr)
+                continue
+            print(f"{kind}/{name}: leaves {format_palette_indices(palette.leaves)} "
+                  f"trunk {format_palette_indices(palette.trunk)} ({palette.source})")
+    return 0
+
+def run_forest(args):
+    try:
+        width, depth = (int(n) for n in args.scene.lower().split("x"))
+        filename, summary = generate_forest(
+            args.species or ["treegen", "pinegen"], args.variants, (width, depth), args.spacing,
+            args.density, args.seed, args.size_jitter, args.overrides, args.workers, args.output)
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 2
+    print(f"{summary['trees']} trees from {len(summary['variants'])} variants "
+          f"({summary['models']} models) in {summary['seconds']:.2f}s -> {filename} "
+          f"({summary['bytes'] / (1 << 20):.1f} MiB)")
+    return 0
+
+def build_cli():
+    import argparse
+    parser = argparse.ArgumentParser(description="Procedural voxel tree generator. Run treegen-pinegen.py without arguments for the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch = commands.add_parser("batch", help="Generate a range of seeds across worker processes")
+    batch.add_argument("generator", choices=sorted(GENERATORS))
+    batch.add_argument("--palette", help="Palette file name (default: the generator's default palette)")
+    batch.add_argument("--params", help="JSON file with parameter values")
+    batch.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                       metavar="KEY=VALUE", help="Override a parameter (repeatable)")
+    batch.add_argument("--seeds", type=seed_list, default="1", help="Seeds to generate, e.g. 1-100 or 1,5,10-20")
+    batch.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    batch.add_argument("--timeout", type=float, help="Per-tree time limit in seconds (POSIX only)")
+    batch.add_argument("--output-dir", help="Where to write <generator>_seed<N>.vox files")
+    batch.add_argument("--cache-dir", default=CACHE_DIR, help="Result cache directory")
+    batch.add_argument("--cache-size", type=float, default=CACHE_MAX_BYTES / (1 << 20),
+                       help="Evict least recently used results beyond this many MiB")
+    batch.add_argument("--no-cache", action="store_true", help="Always regenerate; bypass the result cache")
+    batch.add_argument("--mesh", action="append", choices=MESH_FORMATS,
+                       help="also write a greedy-meshed .obj (+ .mtl, palette texture) or binary glTF .glb "
+                            "next to each .vox (repeatable)")
+    batch.add_argument("--lod", action="append", type=int, metavar="FACTOR",
+                       help=f"also write a FACTOR-times coarser <name>_lod<FACTOR>.vox (repeatable, "
+                            f"e.g. {' '.join(f'--lod {f}' for f in LOD_FACTORS)})")
+    batch.add_argument("--lod-threshold", type=float, default=LOD_THRESHOLD,
+                       help="keep a coarse LOD cell only when more than this fraction of its voxels is "
+                            "occupied (default: any)")
+    batch.add_argument("--profile", metavar="PATH",
+                       help="Write a JSON stage trace, or merged cProfile stats if PATH ends in .prof")
+    batch.add_argument("-v", "--verbose", action="store_true", help="Print every finished tree")
+    batch.set_defaults(func=run_batch)
+
+    forest = commands.add_parser("forest", help="Generate a forest scene of instanced tree variants")
+    forest.add_argument("--species", action="append", metavar="GENERATOR[:PALETTE][=WEIGHT]",
+                        help="Species in the mix (repeatable, default: treegen and pinegen equally)")
+    forest.add_argument("--variants", type=int, default=6, help="Unique trees to generate")
+    forest.add_argument("--scene", default="512x512", help="Ground size in voxels, WIDTHxDEPTH")
+    forest.add_argument("--spacing", type=float, default=40.0, help="Minimum distance between trunks")
+    forest.add_argument("--density", type=float, default=1.0, help="Maximum trees per 100x100 voxels")
+    forest.add_argument("--size-jitter", type=float, default=0.2, help="Random +/- fraction applied to each variant's size")
+    forest.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                        metavar="KEY=VALUE", help="Parameter for every species that has it (repeatable)")
+    forest.add_argument("--seed", type=int, default=1, help="Seed for placement and variant seeds")
+    forest.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    forest.add_argument("--output", help="Output .vox (default: output/forest/forest<N>.vox)")
+    forest.set_defaults(func=run_forest)
+
+    growth = commands.add_parser("growth", help="Export one tree at every level of its growth")
+    growth.add_argument("generator", choices=sorted(GENERATORS))
+    growth.add_argument("--palette", help="Palette file name (default: the generator's default palette)")
+    growth.add_argument("--params", help="JSON file with parameter values")
+    growth.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                        metavar="KEY=VALUE", help="Override a parameter (repeatable)")
+    growth.add_argument("--seed", type=int, default=1, help="Seed of the tree")
+    growth.add_argument("--series", action="store_true",
+                        help="Write numbered <output stem>_<level>.vox files instead of one animated .vox")
+    growth.add_argument("--output", help="Output .vox (default: output/<tree|pine>/<generator>_seed<N>_growth.vox)")
+    growth.set_defaults(func=run_growth)
+
+    explore = commands.add_parser("explore", help="Render a range of seeds into one contact-sheet PNG, without .vox files")
+    explore.add_argument("generator", choices=sorted(GENERATORS))
+    explore.add_argument("--palette", help="Palette file name (default: the generator's default palette)")
+    explore.add_argument("--params", help="JSON file with parameter values")
+    explore.add_argument("--set", dest="overrides", action="append", type=parse_override, default=[],
+                         metavar="KEY=VALUE", help="Override a parameter (repeatable)")
+    explore.add_argument("--seeds", type=seed_list, default="1-100", help="Seeds to render, e.g. 1-100 or 1,5,10-20")
+    explore.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    explore.add_argument("--thumb", type=int, default=EXPLORE_THUMB, help="Size of each front and top view in pixels")
+    explore.add_argument("--columns", type=int, help="Tiles per row (default: a roughly square sheet)")
+    explore.add_argument("--output", help="Output .png (default: output/<tree|pine>/<generator>_seeds_<first>-<last>.png)")
+    explore.set_defaults(func=run_explore)
+
+    serve = commands.add_parser("serve", help="Keep warm workers running behind a local JSON HTTP server")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    serve.add_argument("--port", type=int, default=SERVE_PORT, help="TCP port (0 picks a free one)")
+    serve.add_argument("--socket", metavar="PATH", help="Listen on this Unix socket instead of TCP")
+    serve.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    serve.add_argument("--queue", type=int, default=SERVE_QUEUE,
+                       help="Requests that may wait for a worker before new ones are refused with 503")
+    serve.add_argument("--timeout", type=float, help="Default per-tree time limit in seconds (POSIX only)")
+    serve.add_argument("--cache-dir", default=CACHE_DIR, help="Result cache directory")
+    serve.add_argument("--cache-size", type=float, default=CACHE_MAX_BYTES / (1 << 20),
+                       help="Evict least recently used results beyond this many MiB")
+    serve.add_argument("--no-cache", action="store_true", help="Always regenerate; bypass the result cache")
+    serve.add_argument("-v", "--verbose", action="store_true", help="Log every request")
+    serve.set_defaults(func=run_serve)
+
+    palettes = commands.add_parser("palettes", help="List palettes with their leaf and trunk indices")
+    palettes.add_argument("kinds", nargs="*", metavar="KIND", help="Only list these kinds (tree, pine)")
+    palettes.set_defaults(func=run_palettes)
+
+    bench = commands.add_parser("bench", help="Time every stage over the preset/palette matrix")
+    bench.add_argument("--generator", dest="generators", action="append", choices=sorted(OUTPUTS),
+                       help="Only benchmark this generator (repeatable)")
+    bench.add_argument("--preset", dest="presets", action="append", choices=("sapling", "default", "max"),
+                       help="Only benchmark this preset (repeatable)")
+    bench.add_argument("--seeds", type=seed_list, default="1", help="Seeds to benchmark, e.g. 1-3")
+    bench.add_argument("--rng", choices=RNG_MODES, default="legacy", help="RNG mode to benchmark")
+    bench.add_argument("--report", default="bench_report.json", help="Where to write the JSON report")
+    bench.add_argument("--golden", default=BENCH_GOLDEN, help="Golden SHA-256 hashes to check against")
+    bench.add_argument("--update-golden", action="store_true", help="Record this run's hashes as golden")
+    bench.add_argument("--cold-runs", type=int, default=5,
+                       help="Fresh interpreters per cold-start measurement (0 to skip)")
+    bench.set_defaults(func=run_bench)
+    return parser
+
+def main(argv=None):
+    args = build_cli().parse_args(sys.argv[1:] if argv is None else argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    # Frozen builds re-run this entry point in every spawned worker
+    multiprocessing.freeze_support()
+    sys.exit(main())